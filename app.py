@@ -1,14 +1,21 @@
 from flask import Flask, render_template, request, jsonify
 
-from modules.matrix_multiply import validate_matrix, multiply_matrices
+from modules.matrix_multiply import as_matrix, multiply_matrices, resolve_engine, matrix_to_json
+from modules.batch import multiply_batch
+from modules.sparse import CSRMatrix
+from modules.matrix_cache import MatrixCache
 from flask_socketio import SocketIO, send, emit
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
 socketio = SocketIO(app, cors_allowed_origins='*')
 
+# Cache LRU de resultados por hash de conteúdo (A, B, dtype e engine)
+RESULT_CACHE_BYTES = 256 * 1024 * 1024
+result_cache = MatrixCache(RESULT_CACHE_BYTES)
+
 @app.route('/')
-def multiply_matrices():
+def index():
     titulo = "Multiplicador de Matrizes"
     mensagem = "Bem-vindo ao multiplicador de matrizes!"
     return render_template('home.html', titulo=titulo, mensagem=mensagem)
@@ -30,29 +37,30 @@ def multiply_matrices_endpoint():
         if not data or 'matrixA' not in data or 'matrixB' not in data:
             return jsonify({'error': 'JSON deve conter matrixA e matrixB'}), 400
 
-        matrix_a = data['matrixA']
-        matrix_b = data['matrixB']
-
-        # Validar as matrizes
-        if not validate_matrix(matrix_a):
-            return jsonify({'error': 'matrixA não é uma matriz válida'}), 400
+        # Validar e converter as matrizes (uma única passada sobre os dados)
+        try:
+            array_a, shape_a, _ = as_matrix(data['matrixA'], 'matrixA')
+            array_b, shape_b, _ = as_matrix(data['matrixB'], 'matrixB')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if not validate_matrix(matrix_b):
-            return jsonify({'error': 'matrixB não é uma matriz válida'}), 400
+        # Escolher o engine (por nome ou automaticamente pelo tamanho)
+        engine = resolve_engine(data.get('engine', 'auto'), array_a, array_b)
 
         # Multiplicar as matrizes
-        result = multiply_matrices(matrix_a, matrix_b)
+        result = multiply_matrices(array_a, array_b, engine=engine, cache=result_cache)
 
         # Retornar resultado
         return jsonify({
             'success': True,
-            'matrixA': matrix_a,
-            'matrixB': matrix_b,
+            'matrixA': data['matrixA'],
+            'matrixB': data['matrixB'],
             'result': result,
+            'engine': engine,
             'dimensions': {
-                'matrixA': f"{len(matrix_a)}x{len(matrix_a[0])}",
-                'matrixB': f"{len(matrix_b)}x{len(matrix_b[0])}",
-                'result': f"{len(result)}x{len(result[0])}"
+                'matrixA': f"{shape_a[0]}x{shape_a[1]}",
+                'matrixB': f"{shape_b[0]}x{shape_b[1]}",
+                'result': f"{shape_a[0]}x{shape_b[1]}"
             }
         }), 200
 
@@ -61,6 +69,53 @@ def multiply_matrices_endpoint():
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+@app.route('/api/multiply-batch', methods=['POST'])
+def multiply_batch_endpoint():
+    """
+    Endpoint para multiplicar uma lista de pares pequenos (um matmul por grupo de shapes iguais)
+    """
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Content-Type deve ser application/json'}), 400
+
+        data = request.get_json()
+        pairs = data.get('pairs') if isinstance(data, dict) else None
+        if not isinstance(pairs, list) or not pairs:
+            return jsonify({'error': 'JSON deve conter uma lista pairs não vazia'}), 400
+
+        validated = []
+        for index, pair in enumerate(pairs):
+            if not isinstance(pair, dict) or 'matrixA' not in pair or 'matrixB' not in pair:
+                return jsonify({'error': f'pairs[{index}] deve conter matrixA e matrixB'}), 400
+            try:
+                array_a, shape_a, _ = as_matrix(pair['matrixA'], f'pairs[{index}].matrixA')
+                array_b, shape_b, _ = as_matrix(pair['matrixB'], f'pairs[{index}].matrixB')
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if isinstance(array_a, CSRMatrix) or isinstance(array_b, CSRMatrix):
+                return jsonify({'error': f'pairs[{index}]: lotes aceitam apenas matrizes densas'}), 400
+            if shape_a[1] != shape_b[0]:
+                return jsonify({'error': f'pairs[{index}]: dimensões incompatíveis para multiplicação'}), 400
+            validated.append((array_a, array_b))
+
+        results = multiply_batch(validated)
+
+        return jsonify({
+            'success': True,
+            'results': [matrix_to_json(result) for result in results],
+            'batch_size': len(results)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': f'Erro na multiplicação: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@app.route('/status')
+def status():
+    """Contadores do cache de resultados"""
+    return jsonify({'result_cache': result_cache.stats()})
+
 @socketio.on('connect')
 def handle_connect():
     print('Cliente conectado')
@@ -0,0 +1,330 @@
+"""
+Benchmark ponta a ponta do pipeline distribuído.
+
+Sobe o servidor (server.py) neste processo, conecta N workers (na mesma máquina, em threads ou subprocessos)
+através de um proxy TCP que conta os bytes trocados, e varre tamanhos, números de workers, engines e
+formatos de transmissão. Grava um relatório JSON (e CSV) comparável entre commits:
+
+    python benchmark.py --sizes 256,512 --workers 1,2 --output baseline.json
+    python benchmark.py --sizes 256,512 --workers 1,2 --output atual.json --compare baseline.json
+"""
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+# Variação relativa (latência mediana) a partir da qual a comparação acusa regressão
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+# Tempo máximo para os workers se registrarem no servidor
+WORKER_STARTUP_TIMEOUT = 30
+PROXY_BUFFER_BYTES = 64 * 1024
+
+
+class ByteCountingProxy:
+    """Proxy TCP entre os workers e o servidor que conta os bytes em cada sentido"""
+
+    def __init__(self, target_port):
+        self.target_port = target_port
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.lock = threading.Lock()
+        self.counters = {'to_workers': 0, 'from_workers': 0}
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            client, _ = self.listener.accept()
+            upstream = socket.create_connection(('127.0.0.1', self.target_port))
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._pipe, args=(client, upstream, 'from_workers'), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, client, 'to_workers'), daemon=True).start()
+
+    def _pipe(self, source, target, direction):
+        try:
+            while True:
+                data = source.recv(PROXY_BUFFER_BYTES)
+                if not data:
+                    break
+                target.sendall(data)
+                with self.lock:
+                    self.counters[direction] += len(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                with contextlib.suppress(OSError):
+                    sock.shutdown(socket.SHUT_RDWR)
+
+    def take(self):
+        """Bytes contados desde a última chamada"""
+        with self.lock:
+            counters = dict(self.counters)
+            self.counters = {direction: 0 for direction in self.counters}
+        return counters
+
+
+def start_server(port):
+    """Sobe server.py em uma thread deste processo e retorna o módulo"""
+    import server
+    server.socketio.server.logger.disabled = True
+    server.socketio.server.eio.logger.disabled = True
+    threading.Thread(target=lambda: server.socketio.run(server.app, port=port, allow_unsafe_werkzeug=True,
+                                                        log_output=False), daemon=True).start()
+
+    deadline = time.time() + WORKER_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        with contextlib.suppress(requests.ConnectionError):
+            requests.get(f'http://127.0.0.1:{port}/status', timeout=1)
+            return server
+        time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu na porta {port}")
+
+
+class WorkerGroup:
+    """N workers conectados pelo proxy, em threads (inprocess) ou em subprocessos de worker.py"""
+
+    def __init__(self, server, url, count, wire_format, mode, processes):
+        self.server = server
+        self.workers = []
+        self.heartbeats = []
+        self.procs = []
+        prefix = f"bench-{wire_format}-{count}"
+        for index in range(count):
+            worker_id = f"{prefix}-{index}"
+            if mode == 'subprocess':
+                self.procs.append(subprocess.Popen(
+                    [sys.executable, 'worker.py', url, worker_id, '--wire-format', wire_format,
+                     '--processes', str(processes)],
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            else:
+                from worker import MatrixWorker
+                worker = MatrixWorker(url, worker_id, processes=processes, wire_formats=[wire_format])
+                if not worker.connect():
+                    raise RuntimeError(f"Worker {worker_id} não conectou")
+                self.workers.append(worker)
+                # Sem heartbeats o servidor marca o worker como unresponsive nas pausas entre casos
+                heartbeat = threading.Thread(target=worker.keep_alive, daemon=True)
+                heartbeat.start()
+                self.heartbeats.append(heartbeat)
+
+        self._wait(lambda ids: sum(worker_id.startswith(prefix) for worker_id in ids) == count)
+        self.prefix = prefix
+
+    def _wait(self, condition):
+        deadline = time.time() + WORKER_STARTUP_TIMEOUT
+        while not condition(list(self.server.connected_workers)):
+            if time.time() > deadline:
+                raise RuntimeError("Tempo esgotado esperando os workers")
+            time.sleep(0.05)
+
+    def close(self):
+        for worker in self.workers:
+            worker.disconnect()
+        for heartbeat in self.heartbeats:
+            heartbeat.join()
+        for proc in self.procs:
+            # SIGINT faz o worker desconectar de forma limpa (o servidor remove o registro na hora)
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(WORKER_STARTUP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._wait(lambda ids: not any(worker_id.startswith(self.prefix) for worker_id in ids))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_case(url, proxy, size, engine, repeats, warmup, seed, timeout):
+    """Executa um caso (matrizes size x size) e retorna as métricas.
+    Cada repetição usa matrizes novas (seed por caso) para não acertar o cache de resultados."""
+    rng = np.random.default_rng(seed)
+    latencies, subtasks, errors = [], [], 0
+    traffic = {'to_workers': 0, 'from_workers': 0, 'request': 0, 'response': 0}
+
+    for index in range(warmup + repeats):
+        body = {'matrixA': rng.random((size, size)).tolist(), 'matrixB': rng.random((size, size)).tolist(),
+                'engine': engine, 'timeout': timeout}
+        proxy.take()
+        start = time.perf_counter()
+        response = requests.post(f'{url}/api/multiply-matrices', json=body, timeout=timeout + 5)
+        elapsed = time.perf_counter() - start
+        counted = proxy.take()
+
+        if index < warmup:
+            continue
+        data = response.json()
+        if response.status_code != 200 or not data.get('success'):
+            errors += 1
+            continue
+
+        latencies.append(elapsed)
+        subtasks.append(data.get('subtasks_completed', 0))
+        traffic['to_workers'] += counted['to_workers']
+        traffic['from_workers'] += counted['from_workers']
+        traffic['request'] += len(response.request.body or b'')
+        traffic['response'] += len(response.content)
+
+    done = max(1, len(latencies))
+    p50 = percentile(latencies, 50)
+    flops = 2 * size ** 3
+    return {
+        'repeats': len(latencies),
+        'errors': errors,
+        'latency_mean': float(np.mean(latencies)) if latencies else None,
+        'latency_min': min(latencies) if latencies else None,
+        'latency_p50': p50,
+        'latency_p90': percentile(latencies, 90),
+        'latency_p99': percentile(latencies, 99),
+        'latency_max': max(latencies) if latencies else None,
+        'gflops_p50': flops / p50 / 1e9 if p50 else None,
+        'subtasks_mean': float(np.mean(subtasks)) if subtasks else None,
+        # Bytes médios por multiplicação
+        'bytes_to_workers': traffic['to_workers'] // done,
+        'bytes_from_workers': traffic['from_workers'] // done,
+        'bytes_request': traffic['request'] // done,
+        'bytes_response': traffic['response'] // done
+    }
+
+
+def case_key(result):
+    return (result['mode'], result['size'], result['workers'], result['engine'], result['wire_format'])
+
+
+def compare(results, baseline_path, threshold):
+    """Compara a latência mediana com um relatório anterior; retorna a lista de regressões"""
+    with open(baseline_path) as baseline_file:
+        baseline = {case_key(result): result for result in json.load(baseline_file)['results']}
+
+    regressions = []
+    print(f"\nComparação com {baseline_path} (limite {threshold:.0%}):", file=sys.stderr)
+    for result in results:
+        previous = baseline.get(case_key(result))
+        if not previous or not previous.get('latency_p50') or not result.get('latency_p50'):
+            continue
+        change = result['latency_p50'] / previous['latency_p50'] - 1
+        flag = 'REGRESSÃO' if change > threshold else 'ok'
+        print(f"  {case_key(result)}: p50 {previous['latency_p50']:.4f}s -> {result['latency_p50']:.4f}s "
+              f"({change:+.1%}) {flag}", file=sys.stderr)
+        if change > threshold:
+            regressions.append({'case': case_key(result), 'change': change})
+    return regressions
+
+
+def git_commit():
+    with contextlib.suppress(Exception):
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    return None
+
+
+def write_report(results, args, output):
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args)
+        },
+        'results': results
+    }
+    with open(output, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+
+    csv_path = os.path.splitext(output)[0] + '.csv'
+    with open(csv_path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(results[0]) if results else [])
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"\nRelatório gravado em {output} e {csv_path}", file=sys.stderr)
+
+
+def parse_list(value, kind=str):
+    return [kind(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ponta a ponta da multiplicação distribuída')
+    parser.add_argument('--sizes', default='128,256,512', help='dimensões das matrizes quadradas')
+    parser.add_argument('--workers', default='1,2', help='números de workers')
+    parser.add_argument('--engines', default='auto', help='engines pedidos (auto, numpy, blocked, ...)')
+    parser.add_argument('--wire-formats', default='binary,json', help='formatos de transmissão')
+    parser.add_argument('--mode', choices=['inprocess', 'subprocess'], default='inprocess',
+                        help='workers em threads deste processo ou em subprocessos de worker.py')
+    parser.add_argument('--processes', type=int, default=1, help='processos do pool de cada worker')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='RELATÓRIO', help='relatório anterior para detectar regressões')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument('--verbose', action='store_true', help='mostra os logs do servidor e dos workers')
+    args = parser.parse_args()
+
+    # Os logs do servidor e dos workers em threads vão para /dev/null; o progresso sai em stderr
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+            logging.disable(logging.WARNING)
+
+        server = start_server(args.port)
+        url = f'http://127.0.0.1:{args.port}'
+        proxy = ByteCountingProxy(args.port)
+        proxy_url = f'http://127.0.0.1:{proxy.port}'
+
+        results = []
+        case_number = 0
+        for wire_format in parse_list(args.wire_formats):
+            for count in parse_list(args.workers, int):
+                group = WorkerGroup(server, proxy_url, count, wire_format, args.mode, args.processes)
+                try:
+                    for engine in parse_list(args.engines):
+                        for size in parse_list(args.sizes, int):
+                            case = {'mode': args.mode, 'size': size, 'workers': count, 'engine': engine,
+                                    'wire_format': wire_format}
+                            case_number += 1
+                            case.update(run_case(url, proxy, size, engine, args.repeats, args.warmup,
+                                                 [args.seed, case_number], args.timeout))
+                            results.append(case)
+                            p50 = f"{case['latency_p50']:.4f}s" if case['latency_p50'] else '-'
+                            gflops = f"{case['gflops_p50']:.2f}" if case['gflops_p50'] else '-'
+                            print(f"{wire_format:>6} workers={count} {engine:>8} n={size:<5} p50={p50} "
+                                  f"GFLOP/s={gflops} enviados={case['bytes_to_workers']} "
+                                  f"recebidos={case['bytes_from_workers']} erros={case['errors']}",
+                                  file=sys.stderr)
+                finally:
+                    group.close()
+
+    write_report(results, args, args.output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressão(ões) acima de {args.threshold:.0%}", file=sys.stderr)
+            os._exit(1)
+    # Threads do servidor e do proxy são daemon; sair sem esperar por elas
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
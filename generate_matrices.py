@@ -1,19 +1,66 @@
+import argparse
+
 import numpy as np
 
-rows_A, cols_A = 300, 300
+# Tamanho de cada bloco de linhas gerado ao gravar um .npy (limita a memória usada)
+GENERATE_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def generate_text(path, rows_A, cols_A, dtype='float64'):
+    """Gera uma matriz aleatória no formato texto [[1,2],[3,4]]"""
+    # Gerar as matrizes aleatórias gigantes
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        matriz_A = np.random.rand(rows_A, cols_A).astype(dtype)
+    else:
+        matriz_A = np.random.randint(-10, 10, (rows_A, cols_A)).astype(dtype)
+
+    # Converter as matrizes numpy para listas Python (formato [[1,2],[3,4]])
+    matriz_A_lista = matriz_A.tolist()
+    if dtype == np.float32:
+        # float32 tem ~7 dígitos significativos: escrever só esses (o repr do float64 teria ~18)
+        matriz_A_lista = [[float(f'{value:.8g}') for value in row] for row in matriz_A_lista]
+
+    # Criar o conteúdo do arquivo
+    conteudo = f"\n{matriz_A_lista}\n\n"
+
+    # Salvar no arquivo matriz_grande.txt
+    with open(path, 'w') as arquivo:
+        arquivo.write(conteudo)
+
+    print(f"Arquivo '{path}' criado com as matrizes no formato solicitado.")
+    print(f"Dimensões das matrizes: A={matriz_A.shape}")
+
+
+def generate_npy(path, rows, cols, dtype='float64', seed=None):
+    """Gera uma matriz aleatória direto em um arquivo .npy, bloco a bloco (pode ser maior que a RAM)"""
+    dtype = np.dtype(dtype)
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(rows, cols))
+    rng = np.random.default_rng(seed)
+    chunk_rows = max(1, GENERATE_CHUNK_BYTES // (cols * dtype.itemsize))
 
-# Gerar as matrizes aleatórias gigantes
-matriz_A = np.random.rand(rows_A, cols_A)
+    for start in range(0, rows, chunk_rows):
+        end = min(rows, start + chunk_rows)
+        if dtype.kind == 'f':
+            matrix[start:end] = rng.random((end - start, cols), dtype=dtype)
+        else:
+            matrix[start:end] = rng.integers(-10, 10, (end - start, cols), dtype=dtype)
+    matrix.flush()
 
-# Converter as matrizes numpy para listas Python (formato [[1,2],[3,4]])
-matriz_A_lista = matriz_A.tolist()
+    print(f"Arquivo '{path}' criado: {rows}x{cols} {dtype} ({matrix.nbytes / 1024 ** 3:.2f} GB)")
 
-# Criar o conteúdo do arquivo
-conteudo = f"\n{matriz_A_lista}\n\n"
 
-# Salvar no arquivo matriz_grande.txt
-with open('matriz_grande.txt', 'w') as arquivo:
-    arquivo.write(conteudo)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera matrizes aleatórias para testes')
+    parser.add_argument('--rows', type=int, default=300)
+    parser.add_argument('--cols', type=int, default=300)
+    parser.add_argument('--npy', metavar='ARQUIVO',
+                        help='grava um .npy em blocos (para matrizes de vários GB) em vez do texto')
+    parser.add_argument('--dtype', default='float64', choices=['float64', 'float32', 'int64', 'int32'])
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
 
-print("Arquivo 'matriz_grande.txt' criado com as matrizes no formato solicitado.")
-print(f"Dimensões das matrizes: A={matriz_A.shape}")
+    if args.npy:
+        generate_npy(args.npy, args.rows, args.cols, args.dtype, args.seed)
+    else:
+        generate_text('matriz_grande.txt', args.rows, args.cols, args.dtype)
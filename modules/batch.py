@@ -0,0 +1,35 @@
+try:
+    import numpy as np
+except ImportError:  # Sem NumPy os pares são multiplicados um a um
+    np = None
+
+from modules.matrix_multiply import multiply_matrices
+
+
+def group_pairs(pairs):
+    """
+    Agrupa pares (A, B) com os mesmos shapes.
+    Retorna uma lista de (índices dos pares, As empilhadas (g, m, k), Bs empilhadas (g, k, n)).
+    """
+    groups = {}
+    for index, (matrix_a, matrix_b) in enumerate(pairs):
+        groups.setdefault((matrix_a.shape, matrix_b.shape), []).append(index)
+
+    return [(indices, np.stack([pairs[i][0] for i in indices]), np.stack([pairs[i][1] for i in indices]))
+            for indices in groups.values()]
+
+
+def multiply_batch(pairs):
+    """
+    Multiplica todos os pares com um np.matmul por grupo de shapes iguais.
+    Retorna os resultados na ordem dos pares.
+    """
+    if np is None:
+        return [multiply_matrices(matrix_a, matrix_b) for matrix_a, matrix_b in pairs]
+
+    results = [None] * len(pairs)
+    for indices, stacked_a, stacked_b in group_pairs(pairs):
+        products = np.matmul(stacked_a, stacked_b)
+        for position, index in enumerate(indices):
+            results[index] = products[position]
+    return results
@@ -0,0 +1,115 @@
+import threading
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 é opcional
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
+
+# Codecs disponíveis, dos mais rápidos para os mais lentos: (compressão, descompressão)
+CODECS = {}
+if zstandard is not None:
+    CODECS['zstd'] = (lambda data: zstandard.compress(data, 1), zstandard.decompress)
+if lz4_frame is not None:
+    CODECS['lz4'] = (lz4_frame.compress, lz4_frame.decompress)
+CODECS['zlib'] = (lambda data: zlib.compress(data, 1), zlib.decompress)
+
+# Abaixo deste tamanho o custo de CPU supera a economia de banda
+COMPRESSION_MIN_BYTES = 64 * 1024
+# Acima desta razão (comprimido / original) não vale a pena comprimir
+MAX_COMPRESSED_RATIO = 0.9
+# Com a compressão desligada por razão ruim, um payload a cada PROBE_INTERVAL é medido de novo
+PROBE_INTERVAL = 32
+# Peso da última medida na média móvel da razão
+RATIO_SMOOTHING = 0.3
+
+
+def negotiate_codecs(capabilities):
+    """
+    Codecs suportados pelos dois lados, na ordem de preferência local (workers antigos não comprimem)
+    """
+    supported = capabilities.get('codecs', [])
+    return [codec for codec in CODECS if codec in supported]
+
+
+def compress(data, codec):
+    if codec not in CODECS:
+        raise ValueError(f"Codec não suportado: {codec}")
+    return CODECS[codec][0](data)
+
+
+def decompress(data, codec):
+    if codec not in CODECS:
+        raise ValueError(f"Codec não suportado: {codec}")
+    return CODECS[codec][1](data)
+
+
+class CodecSelector:
+    """
+    Escolhe o codec de cada payload pelo tamanho e pela razão medida nos payloads anteriores
+    do mesmo tipo (ex.: dtype, já que inteiros comprimem bem e floats aleatórios quase nada).
+    Codecs ainda não medidos são testados primeiro; depois vence a menor razão, com empate
+    (até 5%) para o mais rápido. Se nem o melhor compensa, os payloads seguem sem compressão
+    e um a cada PROBE_INTERVAL é medido de novo, pois a razão muda com os dados.
+    """
+
+    def __init__(self, min_bytes=COMPRESSION_MIN_BYTES):
+        self.min_bytes = min_bytes
+        self.lock = threading.Lock()
+        self.ratios = {}
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.payloads = 0
+
+    def choose(self, size, codecs, kind=None):
+        """Codec para um payload de `size` bytes entre os `codecs` aceitos pelo destino (ou None)"""
+        if size < self.min_bytes or not codecs:
+            return None
+
+        with self.lock:
+            ratios = {codec: self.ratios.get((codec, kind)) for codec in codecs}
+            for codec in codecs:
+                if ratios[codec] is None:
+                    return codec
+
+            best = min(ratios.values())
+            chosen = next(codec for codec in codecs if ratios[codec] <= best + 0.05)
+            if ratios[chosen] <= MAX_COMPRESSED_RATIO:
+                return chosen
+
+            self.skipped += 1
+            return chosen if self.skipped % PROBE_INTERVAL == 0 else None
+
+    def encode(self, data, codecs, kind=None):
+        """Comprime `data` se compensar; retorna (bytes, codec ou None)"""
+        codec = self.choose(len(data), codecs, kind)
+        if codec is None:
+            return data, None
+
+        compressed = compress(data, codec)
+        ratio = len(compressed) / max(1, len(data))
+        with self.lock:
+            previous = self.ratios.get((codec, kind), ratio)
+            self.ratios[codec, kind] = previous + RATIO_SMOOTHING * (ratio - previous)
+            if len(compressed) >= len(data):
+                return data, None
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+            self.payloads += 1
+        return compressed, codec
+
+    def stats(self):
+        with self.lock:
+            return {
+                'payloads': self.payloads,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratios': {f"{codec}:{kind}" if kind else codec: ratio
+                           for (codec, kind), ratio in self.ratios.items()}
+            }
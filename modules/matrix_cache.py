@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from modules.wire_format import matrix_digest
+
+
+def matrix_nbytes(matrix):
+    """
+    Tamanho aproximado de uma matriz em bytes (listas contam 8 bytes por elemento)
+    """
+    if hasattr(matrix, 'nbytes'):
+        return matrix.nbytes
+    if not matrix:
+        return 0
+    return len(matrix) * len(matrix[0]) * 8
+
+
+def result_cache_key(matrix_a, matrix_b, engine='auto', matrix_a_id=None, matrix_b_id=None):
+    """
+    Chave de um produto A x B: hashes de conteúdo das duas matrizes (incluindo dtype e shape) e o engine.
+    Ids já conhecidos (hashes do armazenamento de matrizes) evitam recalcular o hash.
+    """
+    digest_a = matrix_a_id or matrix_digest(matrix_a)
+    digest_b = matrix_b_id or matrix_digest(matrix_b)
+    return f"{digest_a}:{digest_b}:{engine}"
+
+
+class MatrixCache:
+    """
+    Cache LRU de matrizes limitado por bytes (e opcionalmente por número de entradas).
+    `on_evict` recebe as chaves que saíram do cache (ou não couberam nele), fora do lock.
+    """
+
+    def __init__(self, max_bytes, max_entries=None, on_evict=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna a matriz associada à chave (ou None) e a marca como usada recentemente"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, matrix, nbytes=None):
+        """Insere a matriz e remove as menos usadas até caber no limite"""
+        nbytes = matrix_nbytes(matrix) if nbytes is None else nbytes
+        if nbytes > self.max_bytes:
+            if self.on_evict is not None:
+                self.on_evict([key])
+            return False
+
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+
+            self.entries[key] = (matrix, nbytes)
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes or (
+                    self.max_entries is not None and len(self.entries) > self.max_entries):
+                evicted_key, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+                evicted.append(evicted_key)
+
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+        return True
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def stats(self):
+        """Contadores do cache"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,50 @@
+def chain_order(dims):
+    """
+    Ordem ótima de um produto em cadeia (programação dinâmica clássica, O(n³)).
+    `dims` tem n + 1 dimensões: a matriz i é dims[i] x dims[i + 1].
+    Retorna (multiplicações-somas mínimas, tabela de cortes: split[i][j] = k separa (i..k)(k+1..j)).
+    """
+    n = len(dims) - 1
+    cost = [[0] * n for _ in range(n)]
+    split = [[0] * n for _ in range(n)]
+
+    for length in range(2, n + 1):
+        for i in range(n - length + 1):
+            j = i + length - 1
+            best = None
+            for k in range(i, j):
+                candidate = cost[i][k] + cost[k + 1][j] + dims[i] * dims[k + 1] * dims[j + 1]
+                if best is None or candidate < best:
+                    best = candidate
+                    split[i][j] = k
+            cost[i][j] = best
+
+    return (cost[0][n - 1] if n else 0), split
+
+
+def chain_parenthesization(split, i, j, names=None):
+    """Parentização legível, ex.: ((M0·M1)·M2)"""
+    if i == j:
+        return names[i] if names else f"M{i}"
+    k = split[i][j]
+    return f"({chain_parenthesization(split, i, k, names)}·{chain_parenthesization(split, k + 1, j, names)})"
+
+
+def evaluate_chain(matrices, split, multiply, i=0, j=None):
+    """
+    Calcula o produto de matrices[i..j] na ordem da tabela de cortes.
+    `multiply(esquerda, direita)` retorna o produto, ou None para interromper a cadeia.
+    """
+    if j is None:
+        j = len(matrices) - 1
+    if i == j:
+        return matrices[i]
+
+    k = split[i][j]
+    left = evaluate_chain(matrices, split, multiply, i, k)
+    if left is None:
+        return None
+    right = evaluate_chain(matrices, split, multiply, k + 1, j)
+    if right is None:
+        return None
+    return multiply(left, right)
@@ -1,20 +1,49 @@
-def multiply_matrices(matrix_a, matrix_b):
+try:
+    import numpy as np
+except ImportError:  # Engines em Python puro continuam disponíveis sem NumPy
+    np = None
+
+from modules.matrix_cache import result_cache_key
+from modules.sparse import CSRMatrix, from_payload, sparse_multiply
+from modules.wire_format import check_integer_range
+
+# Parâmetros ajustáveis dos engines
+BLOCK_SIZE = 64
+STRASSEN_CUTOFF = 128
+
+# Limites usados pela seleção automática (produto das dimensões m*k*n)
+NAIVE_MAX_WORK = 32 ** 3
+STRASSEN_MIN_DIM = 4096
+
+ENGINES = {}
+NUMPY_ENGINES = set()
+
+
+def register_engine(name, requires_numpy=False):
     """
-    Multiplica duas matrizes
+    Registra um engine de multiplicação pelo nome
     """
-    # Verificar se as matrizes podem ser multiplicadas
-    if len(matrix_a[0]) != len(matrix_b):
-        raise ValueError("Número de colunas da matriz A deve ser igual ao número de linhas da matriz B")
+    def decorator(func):
+        if requires_numpy and np is None:
+            return func
+        ENGINES[name] = func
+        if requires_numpy:
+            NUMPY_ENGINES.add(name)
+        return func
+    return decorator
+
 
-    # Dimensões da matriz resultado
+@register_engine('naive')
+def multiply_naive(matrix_a, matrix_b):
+    """
+    Laço triplo i-j-k clássico
+    """
     rows_a = len(matrix_a)
     cols_b = len(matrix_b[0])
     cols_a = len(matrix_a[0])
 
-    # Inicializar matriz resultado com zeros
     result = [[0 for _ in range(cols_b)] for _ in range(rows_a)]
 
-    # Multiplicação das matrizes
     for i in range(rows_a):
         for j in range(cols_b):
             for k in range(cols_a):
@@ -23,21 +52,237 @@ def multiply_matrices(matrix_a, matrix_b):
     return result
 
 
-def validate_matrix(matrix):
+@register_engine('blocked')
+def multiply_blocked(matrix_a, matrix_b, block_size=BLOCK_SIZE):
+    """
+    Kernel em blocos (tiling) com ordem i-k-j: percorre linhas de B em vez de colunas
+    """
+    rows_a = len(matrix_a)
+    cols_b = len(matrix_b[0])
+    cols_a = len(matrix_a[0])
+
+    result = [[0 for _ in range(cols_b)] for _ in range(rows_a)]
+
+    for ii in range(0, rows_a, block_size):
+        i_end = min(ii + block_size, rows_a)
+        for kk in range(0, cols_a, block_size):
+            k_end = min(kk + block_size, cols_a)
+            for jj in range(0, cols_b, block_size):
+                j_end = min(jj + block_size, cols_b)
+                for i in range(ii, i_end):
+                    row_a = matrix_a[i]
+                    row_c = result[i]
+                    for k in range(kk, k_end):
+                        a_ik = row_a[k]
+                        row_b = matrix_b[k]
+                        for j in range(jj, j_end):
+                            row_c[j] += a_ik * row_b[j]
+
+    return result
+
+
+@register_engine('numpy', requires_numpy=True)
+def multiply_numpy(matrix_a, matrix_b):
+    """
+    Kernel vetorizado (BLAS para float)
+    """
+    return np.asarray(matrix_a) @ np.asarray(matrix_b)
+
+
+@register_engine('strassen', requires_numpy=True)
+def multiply_strassen(matrix_a, matrix_b, cutoff=STRASSEN_CUTOFF):
     """
-    Valida se é uma matriz válida
+    Strassen-Winograd recursivo (7 multiplicações e 15 somas por nível).
+    Abaixo de `cutoff` em qualquer dimensão usa o produto do NumPy.
     """
-    if not isinstance(matrix, list) or len(matrix) == 0:
-        return False
+    a = np.asarray(matrix_a)
+    b = np.asarray(matrix_b)
+    return _strassen_winograd(a, b, max(1, cutoff))
+
+
+@register_engine('sparse', requires_numpy=True)
+def multiply_sparse(matrix_a, matrix_b):
+    """
+    Kernels CSR (esparsa x densa, densa x esparsa ou esparsa x esparsa); operandos densos são convertidos.
+    Retorna CSR ou array denso conforme a densidade do resultado.
+    """
+    return sparse_multiply(matrix_a, matrix_b)
+
+
+def _strassen_winograd(a, b, cutoff):
+    m, k = a.shape
+    n = b.shape[1]
+
+    if min(m, k, n) <= cutoff:
+        return a @ b
+
+    # Dimensões ímpares são completadas com zeros para dividir em quadrantes
+    if m % 2 or k % 2 or n % 2:
+        a = np.pad(a, ((0, m % 2), (0, k % 2)))
+        b = np.pad(b, ((0, k % 2), (0, n % 2)))
+        return _strassen_winograd(a, b, cutoff)[:m, :n]
+
+    hm, hk, hn = m // 2, k // 2, n // 2
+    a11, a12, a21, a22 = a[:hm, :hk], a[:hm, hk:], a[hm:, :hk], a[hm:, hk:]
+    b11, b12, b21, b22 = b[:hk, :hn], b[:hk, hn:], b[hk:, :hn], b[hk:, hn:]
+
+    s1 = a21 + a22
+    s2 = s1 - a11
+    s3 = a11 - a21
+    s4 = a12 - s2
+    t1 = b12 - b11
+    t2 = b22 - t1
+    t3 = b22 - b12
+    t4 = t2 - b21
+
+    m1 = _strassen_winograd(a11, b11, cutoff)
+    m2 = _strassen_winograd(a12, b21, cutoff)
+    m3 = _strassen_winograd(s4, b22, cutoff)
+    m4 = _strassen_winograd(a22, t4, cutoff)
+    m5 = _strassen_winograd(s1, t1, cutoff)
+    m6 = _strassen_winograd(s2, t2, cutoff)
+    m7 = _strassen_winograd(s3, t3, cutoff)
+
+    u2 = m1 + m6
+    u3 = u2 + m7
+    u4 = u2 + m5
+
+    result = np.empty((m, n), dtype=m1.dtype)
+    result[:hm, :hn] = m1 + m2
+    result[:hm, hn:] = u4 + m3
+    result[hm:, :hn] = u3 - m4
+    result[hm:, hn:] = u3 + m5
+    return result
+
+
+def select_engine(rows_a, cols_a, cols_b):
+    """
+    Escolhe um engine pelo tamanho do problema
+    """
+    if np is None:
+        return 'naive' if rows_a * cols_a * cols_b <= NAIVE_MAX_WORK else 'blocked'
+
+    if min(rows_a, cols_a, cols_b) >= STRASSEN_MIN_DIM:
+        return 'strassen'
+    return 'numpy'
+
+
+def matrix_shape(matrix):
+    """
+    (linhas, colunas) de uma matriz em listas, array ou CSR
+    """
+    if hasattr(matrix, 'shape'):
+        return tuple(matrix.shape)
+    return len(matrix), len(matrix[0])
+
+
+def resolve_engine(engine, matrix_a, matrix_b):
+    """
+    Retorna o nome do engine a ser usado ('auto' ou None escolhe pelo tamanho).
+    Operandos esparsos sempre usam o engine 'sparse'.
+    """
+    if isinstance(matrix_a, CSRMatrix) or isinstance(matrix_b, CSRMatrix):
+        return 'sparse'
+
+    if engine in (None, 'auto'):
+        rows_a, cols_a = matrix_shape(matrix_a)
+        return select_engine(rows_a, cols_a, matrix_shape(matrix_b)[1])
+
+    if engine not in ENGINES:
+        raise ValueError(f"Engine '{engine}' indisponível. Opções: {['auto'] + list(ENGINES)}")
+
+    return engine
+
+
+def multiply_matrices(matrix_a, matrix_b, engine='auto', cache=None, **options):
+    """
+    Multiplica duas matrizes usando o engine escolhido.
+    Com `cache` (um MatrixCache), produtos repetidos são devolvidos sem recalcular.
+    """
+    # Verificar se as matrizes podem ser multiplicadas
+    if matrix_shape(matrix_a)[1] != matrix_shape(matrix_b)[0]:
+        raise ValueError("Número de colunas da matriz A deve ser igual ao número de linhas da matriz B")
+
+    engine = resolve_engine(engine, matrix_a, matrix_b)
+
+    key = None
+    if cache is not None:
+        key = result_cache_key(matrix_a, matrix_b, engine)
+        cached = cache.get(key)
+        if cached is not None:
+            return matrix_to_json(cached)
+
+    if engine not in NUMPY_ENGINES and np is not None:
+        # Engines em Python puro trabalham sobre listas
+        matrix_a = matrix_a.tolist() if isinstance(matrix_a, np.ndarray) else matrix_a
+        matrix_b = matrix_b.tolist() if isinstance(matrix_b, np.ndarray) else matrix_b
+
+    result = ENGINES[engine](matrix_a, matrix_b, **options)
+
+    if key is not None:
+        cache.put(key, result)
+    return matrix_to_json(result)
+
+
+def matrix_to_json(matrix):
+    """
+    Matriz pronta para JSON: listas para densas, {'format': 'csr', ...} para esparsas
+    """
+    if isinstance(matrix, CSRMatrix):
+        return matrix.to_payload()
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix.tolist()
+    return matrix
+
+
+def as_matrix(matrix, name='matriz'):
+    """
+    Valida e converte uma matriz (listas ou array) em uma única passada.
+    Com NumPy retorna um array 2D contíguo de inteiros ou floats; sem NumPy a própria lista validada.
+    Matrizes esparsas (COO ou CSR) viram CSRMatrix, sem densificar.
+    Retorna (matriz, shape, dtype) e levanta ValueError descrevendo o problema.
+    """
+    # Esparsas: já em CSR ou recebidas como {'format': 'coo' | 'csr', ...}
+    if isinstance(matrix, dict) and 'format' in matrix:
+        matrix = from_payload(matrix, name)
+    if isinstance(matrix, CSRMatrix):
+        check_integer_range(matrix.data, name)
+        return matrix, matrix.shape, matrix.dtype
+
+    if np is None:
+        return _validate_list_matrix(matrix, name)
+
+    try:
+        array = np.ascontiguousarray(matrix)
+    except (ValueError, TypeError):
+        raise ValueError(f"{name} deve ter estrutura retangular")
+
+    if array.ndim != 2 or array.shape[0] == 0 or array.shape[1] == 0:
+        raise ValueError(f"{name} deve ser uma matriz 2D não vazia, recebido shape {array.shape}")
+
+    # Mesma regra do caminho sem NumPy: bool não é número (NumPy converteria True em 1)
+    if array.dtype.kind == 'b' or (isinstance(matrix, list) and any(bool in map(type, row) for row in matrix)):
+        raise ValueError(f"Elementos de {name} devem ser números, recebido bool")
+    if array.dtype.kind not in 'iuf':
+        raise ValueError(f"Elementos de {name} devem ser números, recebido dtype {array.dtype}")
+    check_integer_range(array, name)
+
+    return array, array.shape, array.dtype
+
+
+def _validate_list_matrix(matrix, name):
+    # Sem NumPy: verificação elemento a elemento das listas
+    if not isinstance(matrix, list) or len(matrix) == 0 or not isinstance(matrix[0], list) or len(matrix[0]) == 0:
+        raise ValueError(f"{name} deve ser uma matriz 2D não vazia")
 
-    # Verificar se todas as linhas têm o mesmo tamanho
     row_length = len(matrix[0])
-    for row in matrix:
+    is_float = False
+    for i, row in enumerate(matrix):
         if not isinstance(row, list) or len(row) != row_length:
-            return False
-        # Verificar se todos os elementos são números
+            raise ValueError(f"{name} deve ter estrutura retangular (linha {i})")
         for element in row:
-            if not isinstance(element, (int, float)):
-                return False
+            if isinstance(element, bool) or not isinstance(element, (int, float)):
+                raise ValueError(f"Elementos de {name} devem ser números, recebido {type(element).__name__}")
+            is_float = is_float or isinstance(element, float)
 
-    return True
+    return matrix, (len(matrix), row_length), 'float64' if is_float else 'int64'
@@ -0,0 +1,127 @@
+import os
+import re
+import shutil
+import threading
+import uuid
+
+try:
+    import numpy as np
+except ImportError:  # O armazenamento em disco (.npy com memmap) requer NumPy
+    np = None
+
+from modules.wire_format import BINARY_DTYPES, to_wire_array, matrix_digest
+
+# Ids são hashes de conteúdo (blake2b de 16 bytes em hexadecimal)
+MATRIX_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Tamanho dos blocos ao gravar uploads em disco
+STREAM_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+class MatrixStore:
+    """
+    Matrizes persistidas como arquivos .npy em um diretório, identificadas pelo hash de conteúdo.
+    As leituras usam memmap: fatias viram views do arquivo, sem carregar a matriz inteira.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.opened = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, matrix_id):
+        """Caminho do arquivo de uma matriz (ValueError para ids malformados)"""
+        if not isinstance(matrix_id, str) or not MATRIX_ID_PATTERN.fullmatch(matrix_id):
+            raise ValueError(f"Id de matriz inválido: {matrix_id}")
+        return os.path.join(self.directory, f"{matrix_id}.npy")
+
+    def put(self, matrix):
+        """Grava a matriz (se ainda não existir) e retorna seu id"""
+        array = to_wire_array(matrix)
+        matrix_id = matrix_digest(array)
+        path = self.path(matrix_id)
+
+        with self.lock:
+            if not os.path.exists(path):
+                # Gravar em arquivo temporário e renomear: leitores nunca veem um .npy pela metade
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'wb') as temp_file:
+                    np.save(temp_file, array, allow_pickle=False)
+                os.replace(temp_path, path)
+
+        return matrix_id
+
+    def put_stream(self, stream, validate=None):
+        """
+        Grava um .npy recebido em blocos e retorna seu id, sem carregar a matriz na memória.
+        `validate` recebe o memmap e retorna a matriz validada (ou levanta ValueError).
+        """
+        temp_path = os.path.join(self.directory, f"upload-{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                shutil.copyfileobj(stream, temp_file, STREAM_CHUNK_BYTES)
+
+            try:
+                matrix = np.load(temp_path, mmap_mode='r', allow_pickle=False)
+            except Exception as e:
+                raise ValueError(f"Arquivo .npy inválido: {e}")
+            if validate is not None:
+                matrix = validate(matrix)
+
+            # Fora dos tipos do formato binário (ou em ordem Fortran) é preciso converter em memória
+            if matrix.dtype.str not in BINARY_DTYPES or not matrix.flags.c_contiguous:
+                return self.put(matrix)
+
+            matrix_id = matrix_digest(matrix)
+            path = self.path(matrix_id)
+            with self.lock:
+                if not os.path.exists(path):
+                    os.replace(temp_path, path)
+            return matrix_id
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def create(self, matrix_id, shape, dtype):
+        """Cria um .npy gravável com o id dado, invisível para get até o commit"""
+        return np.lib.format.open_memmap(f"{self.path(matrix_id)}.tmp", mode='w+', dtype=dtype, shape=shape)
+
+    def commit(self, matrix_id):
+        """Publica uma matriz criada com create (o mapeamento aberto continua válido)"""
+        path = self.path(matrix_id)
+        os.replace(f"{path}.tmp", path)
+
+    def discard(self, matrix_id):
+        """Descarta uma matriz criada com create e não publicada"""
+        temp_path = f"{self.path(matrix_id)}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def get(self, matrix_id):
+        """Matriz como memmap somente leitura (ou None se não existir)"""
+        path = self.path(matrix_id)
+        with self.lock:
+            matrix = self.opened.get(matrix_id)
+            if matrix is None:
+                if not os.path.exists(path):
+                    return None
+                matrix = np.load(path, mmap_mode='r', allow_pickle=False)
+                self.opened[matrix_id] = matrix
+            return matrix
+
+    def delete(self, matrix_id):
+        """Remove a matriz do disco; tarefas que já a usam mantêm o mapeamento aberto"""
+        path = self.path(matrix_id)
+        with self.lock:
+            self.opened.pop(matrix_id, None)
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+            return True
+
+    def __contains__(self, matrix_id):
+        try:
+            return os.path.exists(self.path(matrix_id))
+        except ValueError:
+            return False
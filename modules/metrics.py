@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+# Limites (segundos) dos buckets dos histogramas de duração
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Contagem de observações por bucket, mais soma e total (acumulados só na exportação)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Métricas em memória (contadores, gauges e histogramas com labels), exportadas no formato texto do Prometheus.
+    Cada observação custa um lock e uma busca binária.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def describe(self, name, metric_type, help_text, buckets=DEFAULT_BUCKETS):
+        """Registra uma métrica ('counter', 'gauge' ou 'histogram')"""
+        with self.lock:
+            self.metrics[name] = {'type': metric_type, 'help': help_text, 'buckets': buckets, 'series': {}}
+
+    def observe(self, name, value, **labels):
+        """Adiciona uma observação a um histograma"""
+        metric = self.metrics[name]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            histogram = metric['series'].get(key)
+            if histogram is None:
+                histogram = metric['series'][key] = Histogram(metric['buckets'])
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        """Incrementa um contador"""
+        metric = self.metrics[name]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            metric['series'][key] = metric['series'].get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Define o valor de um gauge"""
+        with self.lock:
+            self.metrics[name]['series'][tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        """Todas as métricas no formato texto do Prometheus (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            for name, metric in self.metrics.items():
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                for key, value in metric['series'].items():
+                    if metric['type'] != 'histogram':
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                        continue
+
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + ('+Inf',), value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in key) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,118 @@
+import math
+
+
+def split_range(total, parts):
+    """
+    Divide [0, total) em `parts` intervalos contíguos de tamanhos quase iguais
+    """
+    parts = max(1, min(parts, total))
+    base, extra = divmod(total, parts)
+    ranges = []
+    start = 0
+    for index in range(parts):
+        end = start + base + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def choose_tile_grid(rows, cols, num_workers):
+    """
+    Escolhe a grade (linhas x colunas de tiles) de C com pelo menos `num_workers` tiles.
+
+    Cada tile recebe um painel de linhas de A (rows/pr x k) e um painel de colunas de B (k x cols/pc),
+    então o volume total enviado é proporcional a k * (rows * pc + cols * pr). A grade minimiza esse
+    volume; para matrizes quadradas fica ~sqrt(P) x sqrt(P) e o volume cresce com sqrt(P) em vez de P.
+    """
+    num_workers = max(1, num_workers)
+    best = None
+    for grid_rows in range(1, min(rows, num_workers) + 1):
+        grid_cols = min(cols, math.ceil(num_workers / grid_rows))
+        # Primeiro garantir tiles suficientes para ocupar os workers, depois minimizar o volume
+        key = (-min(grid_rows * grid_cols, num_workers), rows * grid_cols + cols * grid_rows)
+        if best is None or key < best[0]:
+            best = (key, grid_rows, grid_cols)
+    return best[1], best[2]
+
+
+def budget_tile_grid(rows, cols, inner, itemsize, budget, grid_rows=1, grid_cols=1, k_split=1):
+    """
+    Refina a grade (grid_rows x grid_cols x k_split) até que o tile de C (rows/pr x cols/pc),
+    o painel de A (rows/pr x k) e o painel de B (k x cols/pc) caibam em `budget` bytes.
+    A cada passo o maior bloco acima do limite tem sua maior dimensão dividida ao meio.
+    """
+    grid_rows, grid_cols, k_split = min(rows, grid_rows), min(cols, grid_cols), min(inner, k_split)
+    while True:
+        tile_rows = math.ceil(rows / grid_rows)
+        tile_cols = math.ceil(cols / grid_cols)
+        depth = math.ceil(inner / k_split)
+        blocks = [(tile_rows * tile_cols, 'rows', 'cols'), (tile_rows * depth, 'rows', 'k'),
+                  (depth * tile_cols, 'k', 'cols')]
+        size, *dimensions = max(blocks)
+        if size * itemsize <= budget:
+            return grid_rows, grid_cols, k_split
+
+        lengths = {'rows': tile_rows, 'cols': tile_cols, 'k': depth}
+        dimension = max(dimensions, key=lengths.get)
+        if lengths[dimension] == 1:
+            # Um único elemento por dimensão: não há como dividir mais
+            return grid_rows, grid_cols, k_split
+        if dimension == 'rows':
+            grid_rows = min(rows, grid_rows * 2)
+        elif dimension == 'cols':
+            grid_cols = min(cols, grid_cols * 2)
+        else:
+            k_split = min(inner, k_split * 2)
+
+
+# Trabalho mínimo (multiplicações-somas) de um bloco no guided self-scheduling
+MIN_CHUNK_WORK = 2 ** 20
+# Quantas vezes o restante é dividido entre os workers (sobre-subscrição)
+GUIDED_FACTOR = 2
+
+
+def min_chunk_rows(inner, cols):
+    """
+    Menor bloco de linhas que ainda compensa o custo de envio de uma sub-tarefa
+    """
+    return max(1, MIN_CHUNK_WORK // max(1, inner * cols))
+
+
+def guided_chunk_size(remaining, share, min_rows=1):
+    """
+    Guided self-scheduling: o bloco é uma fração do trabalho restante, encolhendo perto do fim.
+    `share` é a fração da capacidade do cluster que o worker representa (1/P para workers iguais).
+    """
+    size = math.ceil(remaining * share / GUIDED_FACTOR)
+    return min(remaining, max(min_rows, size))
+
+
+def batch_ranges(count, item_work, num_workers):
+    """
+    Divide `count` pares de mesmo shape em faixas contíguas: até GUIDED_FACTOR faixas por worker,
+    cada uma com pelo menos MIN_CHUNK_WORK de trabalho quando houver pares suficientes
+    """
+    parts = min(count, max(1, num_workers) * GUIDED_FACTOR, max(1, count * item_work // MIN_CHUNK_WORK))
+    return split_range(count, parts)
+
+
+def weighted_row_ranges(total_rows, weights):
+    """
+    Divide [0, total_rows) em um intervalo por peso, com tamanho proporcional ao peso.
+    Intervalos vazios são omitidos; retorna pares (índice do peso, (início, fim)).
+    """
+    total_weight = sum(weights)
+    if total_weight <= 0:
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+
+    ranges = []
+    start = 0
+    accumulated = 0
+    for index, weight in enumerate(weights):
+        accumulated += weight
+        end = round(total_rows * accumulated / total_weight)
+        if end > start:
+            ranges.append((index, (start, end)))
+        start = end
+    return ranges
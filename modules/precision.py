@@ -0,0 +1,127 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Usado só pelo servidor, que requer NumPy
+    np = None
+
+from modules.sparse import CSRMatrix
+
+# Valores aceitos na opção dtype dos pedidos (None mantém o dtype das entradas)
+DTYPES = ('float64', 'float32', 'int64', 'int32')
+
+
+# Bytes (em float64) lidos por vez ao calcular o limite ou converter uma matriz densa: memmaps
+# do armazenamento são percorridos em blocos de linhas, sem carregar a matriz inteira
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _abs_sums(matrix):
+    """max|x| e as somas de |x| por linha e por coluna, em float64"""
+    rows, cols = matrix.shape
+    if isinstance(matrix, CSRMatrix):
+        values = np.abs(matrix.data.astype(np.float64))
+        return (values.max() if values.size else 0.0,
+                np.bincount(matrix.row_ids(), weights=values, minlength=rows),
+                np.bincount(matrix.indices, weights=values, minlength=cols))
+
+    peak = 0.0
+    row_sums = np.empty(rows)
+    col_sums = np.zeros(cols)
+    step = max(1, BLOCK_BYTES // (cols * 8))
+    for start in range(0, rows, step):
+        block = np.array(matrix[start:start + step], dtype=np.float64)
+        np.abs(block, out=block)
+        peak = max(peak, block.max())
+        row_sums[start:start + step] = block.sum(axis=1)
+        col_sums += block.sum(axis=0)
+    return peak, row_sums, col_sums
+
+
+def product_bound(matrix_a, matrix_b):
+    """
+    Limite superior de |A·B| em qualquer posição (e de qualquer soma parcial do produto):
+    o menor entre max_i Σ_k |a_ik| · max|B| e max|A| · max_j Σ_k |b_kj|, calculado em float64
+    """
+    peak_a, row_sums_a, _ = _abs_sums(matrix_a)
+    peak_b, _, col_sums_b = _abs_sums(matrix_b)
+    if not peak_a or not peak_b:
+        return 0.0
+    return min(row_sums_a.max() * peak_b, peak_a * col_sums_b.max())
+
+
+def _fits(dtype, bound):
+    return dtype.kind not in 'iu' or bound < np.iinfo(dtype).max
+
+
+def choose_dtype(matrix_a, matrix_b, dtype=None):
+    """
+    dtype do cálculo: o pedido ou, sem pedido, o das entradas.
+    Com inteiros o produto é verificado contra overflow pelo product_bound: um dtype inteiro pedido
+    que não comporta o resultado levanta OverflowError; sem pedido, o resultado é promovido
+    (para int64 e, se ainda não couber, float64) para nunca dar a volta silenciosamente.
+    """
+    if dtype is not None:
+        target = np.dtype(dtype)
+        if target.kind == 'i':
+            bound = product_bound(matrix_a, matrix_b)
+            if not _fits(target, bound):
+                # Sugere int64 só quando ele comporta o resultado
+                wider = 'float64' if target == np.int64 or not _fits(np.dtype(np.int64), bound) else 'int64 ou float64'
+                raise OverflowError(f"O resultado pode exceder o intervalo de {dtype}; use {wider}")
+        return target
+
+    target = np.result_type(matrix_a.dtype, matrix_b.dtype)
+    if target.kind not in 'iu':
+        return target
+    bound = product_bound(matrix_a, matrix_b)
+    for candidate in (target, np.dtype(np.int64)):
+        if _fits(candidate, bound):
+            return candidate
+    return np.dtype(np.float64)
+
+
+def cast_operand(matrix, dtype, name='matriz', create=None):
+    """
+    Converte um operando (array ou CSR) para `dtype`, sem cópia se já estiver nele.
+    Para dtypes inteiros os valores precisam ser inteiros e caber no intervalo.
+    A verificação e a conversão são feitas em blocos de linhas; um memmap é convertido no array
+    devolvido por `create(shape, dtype)` (outro memmap), quando dado, em vez de na memória.
+    """
+    values = matrix.data if isinstance(matrix, CSRMatrix) else matrix
+    if values.dtype == dtype:
+        return matrix
+
+    if create is not None and isinstance(values, np.memmap):
+        cast = create(values.shape, dtype)
+    else:
+        cast = np.empty(values.shape, dtype=dtype)
+    row_items = max(1, math.prod(values.shape[1:]))
+    step = max(1, BLOCK_BYTES // (row_items * 8))
+    for start in range(0, values.shape[0], step):
+        block = values[start:start + step]
+        if dtype.kind == 'i' and block.size:
+            if block.dtype.kind == 'f' and not (np.isfinite(block).all() and (np.floor(block) == block).all()):
+                raise ValueError(f"{name} tem valores não inteiros; dtype {dtype} exige inteiros")
+            info = np.iinfo(dtype)
+            if block.min() < info.min or block.max() > info.max:
+                raise ValueError(f"{name} tem valores fora do intervalo de {dtype}")
+        cast[start:start + step] = block
+
+    if isinstance(matrix, CSRMatrix):
+        return CSRMatrix(matrix.shape, matrix.indptr, matrix.indices, cast)
+    return cast
+
+
+def apply_dtype(matrix_a, matrix_b, dtype=None, create=None):
+    """
+    Escolhe o dtype (choose_dtype) e converte os dois operandos quando necessário.
+    Retorna (A, B, dtype); levanta ValueError ou OverflowError descrevendo o problema.
+    `create` é repassado a cast_operand para converter memmaps em disco.
+    """
+    target = choose_dtype(matrix_a, matrix_b, dtype)
+    # Entradas mistas (ex.: int x float) já produzem o dtype escolhido: seguem sem conversão
+    if dtype is None and target == np.result_type(matrix_a.dtype, matrix_b.dtype):
+        return matrix_a, matrix_b, target
+    return (cast_operand(matrix_a, target, 'matrixA', create), cast_operand(matrix_b, target, 'matrixB', create),
+            target)
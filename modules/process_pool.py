@@ -0,0 +1,146 @@
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:  # Sem NumPy as matrizes são copiadas para a memória compartilhada a partir das listas
+    np = None
+
+from modules.matrix_multiply import ENGINES
+from modules.partitioning import split_range
+
+# Abaixo deste trabalho (multiplicações-somas) o bloco é calculado direto, sem o custo de acionar os processos
+POOL_MIN_WORK = 2 ** 16
+
+
+def _describe(matrix):
+    """Shape e código do módulo array da matriz (inteiros como int64, o resto como float64)"""
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix.shape, 'q' if matrix.dtype.kind in 'iu' else 'd'
+    integer = all(isinstance(value, int) for row in matrix for value in row)
+    return (len(matrix), len(matrix[0])), 'q' if integer else 'd'
+
+
+def _share(matrix, shape, typecode):
+    """Copia a matriz (array ou lista de listas) para um bloco novo de memória compartilhada"""
+    size = max(1, shape[0] * shape[1] * array(typecode).itemsize)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    if np is not None and isinstance(matrix, np.ndarray):
+        flat = np.ndarray(shape, dtype=np.int64 if typecode == 'q' else np.float64, buffer=block.buf)
+        flat[...] = matrix
+        del flat
+    else:
+        view = block.buf.cast('B')
+        data = array(typecode, chain.from_iterable(matrix)).tobytes()
+        view[:len(data)] = data
+        view.release()
+    return block
+
+
+def _read_rows(buffer, typecode, cols, start, end):
+    """Linhas [start, end) de uma matriz compartilhada como listas Python"""
+    view = buffer.cast(typecode)
+    try:
+        return [view[row * cols:(row + 1) * cols].tolist() for row in range(start, end)]
+    finally:
+        view.release()
+
+
+def _multiply_rows(a_spec, b_spec, out_spec, start, end, engine):
+    """
+    Executado nos processos: lê as linhas [start, end) de A e a matriz B da memória compartilhada,
+    multiplica com o engine e grava as linhas do resultado direto no bloco de saída
+    """
+    blocks = [shared_memory.SharedMemory(name=spec[0]) for spec in (a_spec, b_spec, out_spec)]
+    try:
+        (_, a_typecode, (_, inner)), (_, b_typecode, (_, cols)), (_, out_typecode, _) = a_spec, b_spec, out_spec
+        rows_a = _read_rows(blocks[0].buf, a_typecode, inner, start, end)
+        matrix_b = _read_rows(blocks[1].buf, b_typecode, cols, 0, inner)
+        result = ENGINES[engine](rows_a, matrix_b)
+
+        data = array(out_typecode, chain.from_iterable(result)).tobytes()
+        view = blocks[2].buf.cast('B')
+        offset = start * cols * array(out_typecode).itemsize
+        view[offset:offset + len(data)] = data
+        view.release()
+    finally:
+        for block in blocks:
+            block.close()
+
+
+class SharedMemoryPool:
+    """
+    Pool de processos para os engines em Python puro: cada bloco de linhas é dividido entre os processos,
+    que leem A e B de multiprocessing.shared_memory (sem cópias serializadas) e gravam o resultado no lugar.
+    B fica compartilhada enquanto as sub-tarefas seguintes usarem a mesma matriz.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self.executor = None
+        # (id da matriz, bloco compartilhado, typecode, shape) da última B usada
+        self.shared_b = None
+
+    def _executor(self):
+        if self.executor is None:
+            # forkserver evita fork de um processo com as threads do cliente Socket.IO
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+            self.executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+        return self.executor
+
+    def _share_b(self, matrix_b, matrix_id):
+        if matrix_id and self.shared_b and self.shared_b[0] == matrix_id:
+            return self.shared_b[1:]
+
+        self._release_b()
+        shape, typecode = _describe(matrix_b)
+        block = _share(matrix_b, shape, typecode)
+        self.shared_b = (matrix_id, block, typecode, shape)
+        return block, typecode, shape
+
+    def _release_b(self):
+        if self.shared_b is not None:
+            self.shared_b[1].close()
+            self.shared_b[1].unlink()
+            self.shared_b = None
+
+    def multiply(self, matrix_a, matrix_b, engine, matrix_b_id=None):
+        """Multiplica A x B dividindo as linhas de A entre os processos; retorna array (ou listas sem NumPy).
+        Com `matrix_b_id`, B continua compartilhada para as próximas sub-tarefas com a mesma matriz."""
+        shape_a, a_typecode = _describe(matrix_a)
+        block_b, b_typecode, shape_b = self._share_b(matrix_b, matrix_b_id)
+        rows, cols = shape_a[0], shape_b[1]
+        out_typecode = 'q' if a_typecode == 'q' and b_typecode == 'q' else 'd'
+
+        block_a = _share(matrix_a, shape_a, a_typecode)
+        block_out = shared_memory.SharedMemory(create=True, size=max(1, rows * cols * array(out_typecode).itemsize))
+        try:
+            a_spec = (block_a.name, a_typecode, shape_a)
+            b_spec = (block_b.name, b_typecode, shape_b)
+            out_spec = (block_out.name, out_typecode, (rows, cols))
+            futures = [self._executor().submit(_multiply_rows, a_spec, b_spec, out_spec, start, end, engine)
+                       for start, end in split_range(rows, self.processes)]
+            for future in futures:
+                future.result()
+
+            if np is not None:
+                dtype = np.int64 if out_typecode == 'q' else np.float64
+                return np.ndarray((rows, cols), dtype=dtype, buffer=block_out.buf).copy()
+            return _read_rows(block_out.buf, out_typecode, cols, 0, rows)
+        finally:
+            for block in (block_a, block_out):
+                block.close()
+                block.unlink()
+            if not matrix_b_id:
+                self._release_b()
+
+    def shutdown(self):
+        """Encerra os processos e libera a memória compartilhada"""
+        self._release_b()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
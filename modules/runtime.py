@@ -0,0 +1,42 @@
+import os
+import sys
+
+# Runtimes do servidor: 'threading' usa o servidor de desenvolvimento do Werkzeug (uma thread por conexão);
+# 'gevent' e 'eventlet' usam green threads e sustentam milhares de conexões em um único processo
+RUNTIMES = ('threading', 'gevent', 'eventlet')
+
+
+def select_runtime(argv=None, default='threading'):
+    """
+    Runtime pedido em --runtime NOME (ou --runtime=NOME) ou na variável SERVER_RUNTIME.
+    Lê só essa opção, sem argparse, para poder ser chamado antes de qualquer outro import.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    runtime = os.environ.get('SERVER_RUNTIME', default)
+    for index, arg in enumerate(argv):
+        if arg == '--runtime' and index + 1 < len(argv):
+            runtime = argv[index + 1]
+        elif arg.startswith('--runtime='):
+            runtime = arg.split('=', 1)[1]
+    if runtime not in RUNTIMES:
+        raise SystemExit(f"Runtime '{runtime}' inválido. Opções: {list(RUNTIMES)}")
+    return runtime
+
+
+def monkey_patch(runtime):
+    """
+    Troca threads, locks, filas, sockets e sleeps da biblioteca padrão pelas versões cooperativas do runtime.
+    Precisa rodar antes de importar Flask, Socket.IO ou qualquer módulo que use threading.
+    """
+    if runtime == 'gevent':
+        try:
+            from gevent import monkey
+        except ImportError:
+            raise SystemExit("Runtime 'gevent' requer o pacote gevent (pip install gevent)")
+        monkey.patch_all()
+    elif runtime == 'eventlet':
+        try:
+            import eventlet
+        except ImportError:
+            raise SystemExit("Runtime 'eventlet' requer o pacote eventlet (pip install eventlet)")
+        eventlet.monkey_patch()
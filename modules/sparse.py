@@ -0,0 +1,287 @@
+try:
+    import numpy as np
+except ImportError:  # Matrizes esparsas requerem NumPy
+    np = None
+
+# Acima desta densidade (fração de não-zeros) o resultado é devolvido denso
+SPARSE_RESULT_MAX_DENSITY = 0.25
+# Limites do shape declarado por uma matriz esparsa, verificados antes de qualquer alocação:
+# indptr tem uma posição por linha, e o resultado de um produto com ela é montado denso
+MAX_SPARSE_DIMENSION = 2 ** 22
+MAX_SPARSE_ELEMENTS = 2 ** 28
+# Limite de produtos parciais materializados de uma vez pelos kernels (memória temporária)
+KERNEL_BLOCK_ELEMENTS = 2 ** 22
+
+
+class CSRMatrix:
+    """
+    Matriz esparsa em CSR (linhas comprimidas) implementada só com NumPy.
+    Fatias por linhas são views dos arrays originais, sem densificar.
+    """
+
+    ndim = 2
+
+    def __init__(self, shape, indptr, indices, data):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nnz(self):
+        return int(self.indptr[-1])
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    @property
+    def density(self):
+        size = self.shape[0] * self.shape[1]
+        return self.nnz / size if size else 0.0
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rows, cols = key
+        row_start, row_end, _ = rows.indices(self.shape[0])
+        col_start, col_end, _ = cols.indices(self.shape[1])
+        return self.submatrix(row_start, row_end, col_start, col_end)
+
+    def submatrix(self, row_start, row_end, col_start, col_end):
+        """Bloco [row_start:row_end, col_start:col_end] em CSR"""
+        begin, end = self.indptr[row_start], self.indptr[row_end]
+        indptr = self.indptr[row_start:row_end + 1] - begin
+        indices = self.indices[begin:end]
+        data = self.data[begin:end]
+        shape = (row_end - row_start, col_end - col_start)
+
+        if col_start == 0 and col_end == self.shape[1]:
+            return CSRMatrix(shape, indptr, indices, data)
+
+        # Faixa de colunas: manter só os não-zeros dentro dela e recontar por linha
+        keep = (indices >= col_start) & (indices < col_end)
+        row_ids = np.repeat(np.arange(shape[0]), np.diff(indptr))
+        new_indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids[keep], minlength=shape[0]), out=new_indptr[1:])
+        return CSRMatrix(shape, new_indptr, indices[keep] - col_start, data[keep])
+
+    def row_ids(self):
+        """Linha de cada não-zero"""
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def toarray(self):
+        """Matriz densa equivalente"""
+        result = np.zeros(self.shape, dtype=self.dtype)
+        self.add_to(result)
+        return result
+
+    def add_to(self, target):
+        """Soma os não-zeros em um array denso do mesmo shape (tocando só as posições não-zero)"""
+        np.add.at(target, (self.row_ids(), self.indices), self.data)
+        return target
+
+    def transpose(self):
+        """Transposta em CSR"""
+        return from_coo((self.shape[1], self.shape[0]), self.indices, self.row_ids(), self.data)
+
+    def to_payload(self):
+        """Representação JSON ({'format': 'csr', ...}), a mesma aceita pela API"""
+        return {
+            'format': 'csr',
+            'shape': list(self.shape),
+            'indptr': self.indptr.tolist(),
+            'indices': self.indices.tolist(),
+            'data': self.data.tolist()
+        }
+
+
+def from_coo(shape, row, col, data, sum_duplicates=True):
+    """
+    Converte triplas COO (linha, coluna, valor) em CSR, somando posições repetidas
+    """
+    row = np.asarray(row, dtype=np.int64)
+    col = np.asarray(col, dtype=np.int64)
+    data = np.asarray(data)
+    rows, cols = int(shape[0]), int(shape[1])
+
+    order = np.argsort(row * cols + col, kind='stable')
+    row, col, data = row[order], col[order], data[order]
+
+    if sum_duplicates and len(row) > 1:
+        keys = row * cols + col
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        if len(starts) < len(keys):
+            data = np.add.reduceat(data, starts)
+            row, col = row[starts], col[starts]
+
+    indptr = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=rows), out=indptr[1:])
+    return CSRMatrix((rows, cols), indptr, col, data)
+
+
+def from_dense(matrix):
+    """Converte um array denso em CSR"""
+    matrix = np.asarray(matrix)
+    row, col = np.nonzero(matrix)
+    return from_coo(matrix.shape, row, col, matrix[row, col], sum_duplicates=False)
+
+
+def from_payload(payload, name='matriz'):
+    """
+    Valida e converte uma matriz esparsa recebida em JSON:
+    {'format': 'coo', 'shape': [m, n], 'row': [...], 'col': [...], 'data': [...]} ou
+    {'format': 'csr', 'shape': [m, n], 'indptr': [...], 'indices': [...], 'data': [...]}
+    """
+    if np is None:
+        raise ValueError("Matrizes esparsas requerem NumPy")
+
+    sparse_format = payload.get('format')
+    shape = payload.get('shape')
+    if (not isinstance(shape, (list, tuple)) or len(shape) != 2
+            or not all(isinstance(dim, int) and dim > 0 for dim in shape)):
+        raise ValueError(f"{name} deve ter shape [linhas, colunas] positivos")
+    rows, cols = shape
+    if max(rows, cols) > MAX_SPARSE_DIMENSION or rows * cols > MAX_SPARSE_ELEMENTS:
+        raise ValueError(f"{name} excede o shape máximo de matrizes esparsas "
+                         f"({MAX_SPARSE_DIMENSION} por dimensão, {MAX_SPARSE_ELEMENTS} elementos)")
+
+    try:
+        data = np.asarray(payload['data'])
+        if sparse_format == 'coo':
+            row = np.asarray(payload['row'])
+            col = np.asarray(payload['col'])
+        elif sparse_format == 'csr':
+            indptr = np.asarray(payload['indptr'])
+            indices = np.asarray(payload['indices'])
+        else:
+            raise ValueError(f"Formato esparso de {name} deve ser 'coo' ou 'csr'")
+    except KeyError as e:
+        raise ValueError(f"{name} ({sparse_format}) sem o campo {e}")
+
+    if data.ndim != 1 or (data.size and data.dtype.kind not in 'iuf'):
+        raise ValueError(f"Valores de {name} devem ser uma lista de números")
+    if data.size == 0:
+        data = data.astype(np.float64)
+
+    if sparse_format == 'coo':
+        if not _valid_index_array(row, data.size, rows) or not _valid_index_array(col, data.size, cols):
+            raise ValueError(f"Índices de {name} inválidos: row/col devem ter o tamanho de data e estar no shape")
+        return from_coo(shape, row, col, data)
+
+    if (indptr.ndim != 1 or len(indptr) != rows + 1 or (indptr.size and indptr.dtype.kind not in 'iu')
+            or indptr[0] != 0 or indptr[-1] != data.size or np.any(np.diff(indptr) < 0)):
+        raise ValueError(f"indptr de {name} inválido")
+    if not _valid_index_array(indices, data.size, cols):
+        raise ValueError(f"indices de {name} inválidos")
+    return CSRMatrix(shape, indptr.astype(np.int64), indices.astype(np.int64), data)
+
+
+def dense_result_fits(rows, cols):
+    """Se o resultado denso (rows x cols) de um produto com operando esparso cabe no limite"""
+    return rows * cols <= MAX_SPARSE_ELEMENTS
+
+
+def _valid_index_array(index, size, limit):
+    if index.ndim != 1 or len(index) != size:
+        return False
+    if size == 0:
+        return True
+    return index.dtype.kind in 'iu' and index.min() >= 0 and index.max() < limit
+
+
+def sparse_dense(a, b):
+    """
+    CSR x denso: cada não-zero a_ik soma a_ik * B[k, :] na linha i.
+    O trabalho é proporcional a nnz(A) x colunas de B.
+    """
+    b = np.asarray(b)
+    result = np.zeros((a.shape[0], b.shape[1]), dtype=np.result_type(a.dtype, b.dtype))
+    rows = a.row_ids()
+    step = max(1, KERNEL_BLOCK_ELEMENTS // max(1, b.shape[1]))
+
+    for start in range(0, a.nnz, step):
+        end = min(a.nnz, start + step)
+        partial = a.data[start:end, None] * b[a.indices[start:end]]
+        # Não-zeros vêm ordenados por linha: somar cada segmento de uma vez
+        block_rows = rows[start:end]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(block_rows)) + 1))
+        result[block_rows[starts]] += np.add.reduceat(partial, starts, axis=0)
+
+    return result
+
+
+def dense_sparse(a, b):
+    """Denso x CSR, calculado como (B^T x A^T)^T"""
+    return np.ascontiguousarray(sparse_dense(b.transpose(), np.asarray(a).T).T)
+
+
+def sparse_sparse(a, b):
+    """
+    CSR x CSR (Gustavson vetorizado): expande os produtos a_ik * b_kj em blocos e soma os de mesma posição.
+    O trabalho é proporcional ao número de produtos não-zero.
+    """
+    a_indices = a.indices
+    a_data = a.data
+    a_rows = a.row_ids()
+    counts = np.diff(b.indptr)[a_indices]
+    totals = np.cumsum(counts)
+
+    rows, cols, values = [], [], []
+    start = 0
+    while start < a.nnz:
+        base = totals[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(totals, base + KERNEL_BLOCK_ELEMENTS, side='right')))
+        block_counts = counts[start:end]
+        total = int(block_counts.sum())
+        if total:
+            # Posição em B de cada produto: início da linha k + deslocamento dentro dela
+            first = np.cumsum(block_counts) - block_counts
+            offsets = np.repeat(b.indptr[a_indices[start:end]] - first, block_counts) + np.arange(total)
+            partial = from_coo((a.shape[0], b.shape[1]), np.repeat(a_rows[start:end], block_counts),
+                               b.indices[offsets], np.repeat(a_data[start:end], block_counts) * b.data[offsets])
+            rows.append(partial.row_ids())
+            cols.append(partial.indices)
+            values.append(partial.data)
+        start = end
+
+    dtype = np.result_type(a.dtype, b.dtype)
+    if not rows:
+        return CSRMatrix((a.shape[0], b.shape[1]), np.zeros(a.shape[0] + 1, dtype=np.int64),
+                         np.zeros(0, dtype=np.int64), np.zeros(0, dtype=dtype))
+    return from_coo((a.shape[0], b.shape[1]), np.concatenate(rows), np.concatenate(cols),
+                    np.concatenate(values).astype(dtype, copy=False))
+
+
+def sparse_multiply(a, b):
+    """
+    Multiplica operandos CSR e/ou densos pelo kernel adequado e escolhe o formato do resultado pela densidade
+    """
+    a_sparse = isinstance(a, CSRMatrix)
+    b_sparse = isinstance(b, CSRMatrix)
+
+    if a_sparse and b_sparse:
+        result = sparse_sparse(a, b)
+    elif a_sparse:
+        result = sparse_dense(a, b)
+    elif b_sparse:
+        result = dense_sparse(a, b)
+    else:
+        result = sparse_dense(from_dense(a), b)
+
+    return choose_result_format(result)
+
+
+def choose_result_format(result):
+    """CSR se a densidade for no máximo SPARSE_RESULT_MAX_DENSITY, denso caso contrário"""
+    if isinstance(result, CSRMatrix):
+        return result if result.density <= SPARSE_RESULT_MAX_DENSITY else result.toarray()
+
+    if np.count_nonzero(result) <= SPARSE_RESULT_MAX_DENSITY * result.size:
+        return from_dense(result)
+    return result
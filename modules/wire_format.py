@@ -0,0 +1,180 @@
+import hashlib
+import json
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Sem NumPy apenas o formato JSON está disponível
+    np = None
+
+from modules.compression import decompress
+from modules.sparse import CSRMatrix
+
+# Formatos em ordem de preferência
+WIRE_FORMATS = ['binary', 'json'] if np is not None else ['json']
+
+# Tipos aceitos no formato binário (sempre little-endian)
+BINARY_DTYPES = ('<f8', '<f4', '<i8', '<i4')
+
+# Tamanho das faixas de linhas lidas ao calcular o hash de uma fatia não contígua
+DIGEST_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def negotiate_wire_format(capabilities):
+    """
+    Escolhe o melhor formato suportado pelos dois lados (workers antigos usam JSON)
+    """
+    supported = capabilities.get('wire_formats', ['json'])
+    for wire_format in WIRE_FORMATS:
+        if wire_format in supported:
+            return wire_format
+    return 'json'
+
+
+def check_integer_range(array, name='matriz'):
+    """
+    Inteiros sem sinal de 64 bits viram int64: valores acima de 2**63-1 dariam a volta em silêncio.
+    Levanta ValueError se houver algum.
+    """
+    if array.dtype.kind == 'u' and array.dtype.itemsize >= 8 and array.size and array.max() > np.iinfo(np.int64).max:
+        raise ValueError(f"{name} tem valores acima de {np.iinfo(np.int64).max} (maior inteiro suportado)")
+
+
+def to_wire_array(matrix):
+    """
+    Converte a matriz em um array contíguo little-endian de um dos BINARY_DTYPES
+    (ValueError para uint64 fora do intervalo de int64)
+    """
+    array = np.asarray(matrix)
+    check_integer_range(array)
+    if array.dtype.kind in 'iub':
+        dtype = np.dtype('<i4') if array.dtype.itemsize <= 4 and array.dtype.kind == 'i' else np.dtype('<i8')
+    elif array.dtype == np.float32:
+        dtype = np.dtype('<f4')
+    else:
+        dtype = np.dtype('<f8')
+    return np.ascontiguousarray(array, dtype=dtype)
+
+
+def encode_matrix(matrix, wire_format='json', codecs=None, selector=None):
+    """
+    Codifica uma matriz para envio via Socket.IO.
+    No formato binário os bytes vão como anexo binário do Socket.IO, com cabeçalho de shape/dtype.
+    Matrizes CSR levam só indptr, indices e data.
+    Com um CodecSelector, os bytes podem ir comprimidos com um dos `codecs` aceitos pelo destino.
+    """
+    if isinstance(matrix, CSRMatrix):
+        return {
+            '__matrix__': 'csr',
+            'shape': list(matrix.shape),
+            'indptr': _encode_vector(matrix.indptr, wire_format, codecs, selector),
+            'indices': _encode_vector(matrix.indices, wire_format, codecs, selector),
+            'data': _encode_vector(matrix.data, wire_format, codecs, selector)
+        }
+
+    if wire_format == 'binary':
+        array = to_wire_array(matrix)
+        payload = {
+            '__matrix__': 'binary',
+            'dtype': array.dtype.str,
+            'shape': list(array.shape)
+        }
+        return _attach_data(payload, array, codecs, selector)
+
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix.tolist()
+    return matrix
+
+
+def _attach_data(payload, array, codecs, selector):
+    data = array.tobytes()
+    if selector is not None:
+        data, codec = selector.encode(data, codecs, array.dtype.str)
+        if codec:
+            payload['codec'] = codec
+    payload['data'] = data
+    return payload
+
+
+def _payload_data(payload):
+    """Bytes de um payload binário, descomprimidos se vierem com codec"""
+    if 'codec' in payload:
+        return decompress(payload['data'], payload['codec'])
+    return payload['data']
+
+
+def _encode_vector(vector, wire_format, codecs=None, selector=None):
+    if wire_format == 'binary':
+        array = to_wire_array(vector)
+        return _attach_data({'dtype': array.dtype.str}, array, codecs, selector)
+    return vector.tolist()
+
+
+def _decode_vector(payload):
+    if isinstance(payload, dict):
+        if payload.get('dtype') not in BINARY_DTYPES:
+            raise ValueError(f"dtype não suportado no formato binário: {payload.get('dtype')}")
+        return np.frombuffer(_payload_data(payload), dtype=np.dtype(payload['dtype']))
+    return np.asarray(payload)
+
+
+def decode_matrix(payload):
+    """
+    Decodifica uma matriz recebida. Payloads binários viram arrays sem cópia (somente leitura),
+    exceto os comprimidos, descomprimidos antes.
+    """
+    if isinstance(payload, dict) and payload.get('__matrix__') == 'csr':
+        if np is None:
+            raise ValueError("Matrizes esparsas requerem NumPy")
+        data = _decode_vector(payload['data'])
+        return CSRMatrix(payload['shape'], _decode_vector(payload['indptr']).astype(np.int64, copy=False),
+                         _decode_vector(payload['indices']).astype(np.int64, copy=False),
+                         data if data.size else data.astype(np.float64))
+
+    if isinstance(payload, dict) and payload.get('__matrix__') == 'binary':
+        if np is None:
+            raise ValueError("Formato binário requer NumPy")
+        if payload.get('dtype') not in BINARY_DTYPES:
+            raise ValueError(f"dtype não suportado no formato binário: {payload.get('dtype')}")
+
+        # 2D para matrizes, 3D para lotes de pares empilhados
+        shape = tuple(payload['shape'])
+        array = np.frombuffer(_payload_data(payload), dtype=np.dtype(payload['dtype']))
+        if len(shape) not in (2, 3) or array.size != math.prod(shape):
+            raise ValueError(f"Payload binário inconsistente: shape {shape}, {array.size} elementos")
+        return array.reshape(shape)
+
+    return payload
+
+
+def matrix_digest(matrix):
+    """
+    Hash de conteúdo (dtype, shape e bytes) usado como identificador da matriz
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(matrix, CSRMatrix):
+        digest.update(f"csr{matrix.shape}".encode())
+        for vector in (matrix.indptr, matrix.indices, matrix.data):
+            array = to_wire_array(vector)
+            digest.update(array.dtype.str.encode())
+            digest.update(array.data)
+        return digest.hexdigest()
+
+    if np is None:
+        digest.update(json.dumps(matrix).encode())
+        return digest.hexdigest()
+
+    array = np.asarray(matrix)
+    if array.ndim == 2 and not array.flags.c_contiguous:
+        # Fatias não contíguas (painéis de um memmap) são lidas em faixas de linhas, sem copiar
+        # o painel inteiro; os bytes e o hash são os mesmos da versão contígua
+        digest.update(f"{to_wire_array(array[:0]).dtype.str}{array.shape}".encode())
+        step = max(1, DIGEST_BLOCK_BYTES // max(1, array.shape[1] * array.itemsize))
+        for start in range(0, array.shape[0], step):
+            digest.update(to_wire_array(array[start:start + step]).data)
+        return digest.hexdigest()
+
+    array = to_wire_array(array)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(array.data)
+    return digest.hexdigest()
@@ -1,134 +1,1158 @@
 import os
 
-from flask import Flask, render_template, request, jsonify
+from modules.runtime import RUNTIMES, select_runtime, monkey_patch
+
+# Runtime escolhido antes dos outros imports: com gevent/eventlet, threads, locks, filas e sockets viram
+# green threads, e as rotas que aguardam uma tarefa (Event.wait) suspendem só a green thread.
+# Importado por outro programa (ex.: gunicorn), vale só a variável SERVER_RUNTIME
+RUNTIME = select_runtime(None if __name__ == '__main__' else [])
+monkey_patch(RUNTIME)
+
+import argparse
+import logging
+from flask import Flask, render_template, request, jsonify, Response, send_file
 from flask_socketio import SocketIO, emit
 import uuid
 import time
 import json
-from collections import defaultdict
+import math
+import queue
+from collections import defaultdict, deque, OrderedDict
 import threading
 
+import numpy as np
+
+from modules.matrix_multiply import ENGINES, as_matrix, matrix_to_json
+from modules.batch import group_pairs
+from modules.matrix_chain import chain_order, chain_parenthesization, evaluate_chain
+from modules.metrics import MetricsRegistry
+from modules.compression import CodecSelector, negotiate_codecs
+from modules.precision import DTYPES, apply_dtype
+from modules.wire_format import negotiate_wire_format, encode_matrix, decode_matrix, matrix_digest
+from modules.matrix_cache import MatrixCache, result_cache_key
+from modules.matrix_store import MatrixStore
+from modules.sparse import CSRMatrix, MAX_SPARSE_ELEMENTS, choose_result_format, dense_result_fits
+from modules.partitioning import (split_range, choose_tile_grid, budget_tile_grid, guided_chunk_size,
+                                  min_chunk_rows, weighted_row_ranges, batch_ranges)
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'matrix_multiplication_secret'
-socketio = SocketIO(app, cors_allowed_origins='*', logger=True, engineio_logger=True)
+# Limite de uma mensagem Socket.IO (o padrão de 1 MB derruba workers que devolvem blocos maiores)
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+# Logs de pacotes Socket.IO/Engine.IO desligados (custam caro com muitas conexões); --verbose os liga
+socketio = SocketIO(app, cors_allowed_origins='*', async_mode=RUNTIME, logger=False, engineio_logger=False,
+                    max_http_buffer_size=MAX_MESSAGE_BYTES)
 
 
 # Armazenamento de workers e tarefas
 connected_workers = {}
 pending_tasks = {}
-completed_tasks = {}
+# Tarefas finalizadas em ordem de término, removidas por idade ou pelo limite de memória
+completed_tasks = OrderedDict()
 task_results = defaultdict(dict)
-def validate_matrix_complete(matrix):
-    """Validação completa da estrutura da matriz"""
-    if not isinstance(matrix, list) or len(matrix) == 0:
-        return False
-
-    # Verificar se todas as linhas têm o mesmo tamanho
-    row_length = len(matrix[0])
-    for row in matrix:
-        if not isinstance(row, list) or len(row) != row_length:
-            return False
-        # Verificar se todos os elementos são números
-        for element in row:
-            if not isinstance(element, (int, float)):
-                return False
+# Vazão inicial estimada por núcleo (multiplicações-somas por segundo) até haver medições
+DEFAULT_CORE_THROUGHPUT = 1e9
+# Peso de cada nova medição na média exponencial da vazão dos workers
+THROUGHPUT_SMOOTHING = 0.3
+# Prazo padrão e máximo de uma tarefa (segundos), configurável por pedido
+DEFAULT_JOB_TIMEOUT = 30
+MAX_JOB_TIMEOUT = 3600
+# Sem heartbeat (ou outro evento) por este tempo, o worker perde os leases das suas sub-tarefas
+HEARTBEAT_TIMEOUT = 15
+# Máximo de sub-tarefas simultâneas por worker (os que têm fila local anunciam 'slots')
+MAX_WORKER_SLOTS = 4
+# Tarefas com até este trabalho (multiplicações-somas) entram na via rápida, à frente das grandes
+FAST_LANE_WORK = 2 ** 24
+# Prioridade aceita nos pedidos ("priority"); maior é atendida antes
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+# Teto do tempo estimado de um bloco recortado: uma tarefa que chega depois espera no máximo
+# um bloco por slot do worker, e não o resto de uma tarefa grande
+MAX_CHUNK_SECONDS = 0.5
+# Falhas de uma mesma sub-tarefa (erro no worker ou resultado inválido) que encerram a tarefa como 'failed'
+MAX_SUBTASK_FAILURES = 3
+# Intervalo do monitor de leases e de execução especulativa
+MONITOR_INTERVAL = 1.0
+# Uma sub-tarefa é duplicada quando passa deste múltiplo do tempo esperado (e do mínimo em segundos)
+SPECULATION_FACTOR = 2.0
+SPECULATION_MIN_SECONDS = 1.0
+# Tarefas finalizadas ficam disponíveis por este tempo (segundos) e até este total de bytes de resultado
+COMPLETED_TASK_TTL = 600
+COMPLETED_TASKS_MAX_BYTES = 512 * 1024 * 1024
+# Matrizes B compartilhadas entre sub-tarefas, por hash de conteúdo: {'matrix': array, 'tasks': set()}
+shared_matrices = {}
+# Cache LRU de resultados por hash de conteúdo (A, B, dtype e engine); acertos não acionam workers
+RESULT_CACHE_BYTES = 256 * 1024 * 1024
+result_cache = MatrixCache(RESULT_CACHE_BYTES)
+# Matrizes enviadas uma vez e usadas por referência ({"ref": id}), persistidas como .npy
+MATRIX_STORE_DIR = os.environ.get('MATRIX_STORE_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'matrix_store'))
+matrix_store = MatrixStore(MATRIX_STORE_DIR)
+# Resultados acima deste tamanho são montados em um memmap no armazenamento (modo out-of-core)
+OUT_OF_CORE_RESULT_BYTES = 1024 * 1024 * 1024
+# No modo out-of-core, limite de cada tile de C e de cada painel de A e B enviado (bem abaixo de
+# MAX_MESSAGE_BYTES); no fio cada elemento ocupa no máximo WIRE_ITEM_BYTES
+OUT_OF_CORE_BLOCK_BYTES = MAX_MESSAGE_BYTES // 4
+WIRE_ITEM_BYTES = 8
+# Compressão dos payloads binários enviados aos workers (codec escolhido por tamanho e razão medida)
+payload_compression = CodecSelector()
+
+# Fases de uma sub-tarefa: codificação no servidor, envio, fila no worker (inclui decodificação),
+# cálculo, retorno (codificação no worker e transferência) e cópia no resultado
+SUBTASK_PHASES = ('serialize', 'dispatch', 'queue', 'compute', 'return', 'assemble')
+# Máximo de sub-tarefas guardadas na linha do tempo de uma tarefa
+MAX_TIMELINE_ENTRIES = 10000
+# Métricas exportadas em /metrics (formato texto do Prometheus)
+metrics = MetricsRegistry()
+metrics.describe('matrix_subtask_phase_seconds', 'histogram', 'Duração de cada fase das sub-tarefas, por worker')
+metrics.describe('matrix_job_duration_seconds', 'histogram', 'Duração das tarefas, por estado final')
+metrics.describe('matrix_jobs_total', 'counter', 'Tarefas finalizadas, por estado')
+metrics.describe('matrix_jobs_rejected_total', 'counter', 'Tarefas recusadas pelo controle de admissão (429), por via')
+metrics.describe('matrix_subtasks_completed_total', 'counter', 'Resultados de sub-tarefas recebidos, por worker')
+metrics.describe('matrix_workers_connected', 'gauge', 'Workers conectados')
+metrics.describe('matrix_pending_tasks', 'gauge', 'Tarefas em andamento')
+metrics.describe('matrix_completed_tasks_bytes', 'gauge', 'Memória ocupada pelos resultados de tarefas finalizadas')
+metrics.describe('matrix_backlog_seconds', 'gauge', 'Trabalho pendente em segundos de cluster (pela vazão medida)')
 
-    return True
 
 class TaskManager:
     def __init__(self):
         self.lock = threading.Lock()
-
-    def create_task(self, matrix_a, matrix_b):
-        """Divide a matriz A em blocos para distribuição"""
+        self.completed_bytes = 0
+        # Trabalho (multiplicações-somas) das sub-tarefas em execução, por cliente (fair share)
+        self.client_running = defaultdict(int)
+
+    def create_task(self, matrix_a, matrix_b, engine='auto', decomposition='rows', k_split=1,
+                    scheduling='dynamic', timeout=None, cache_key=None, matrix_b_id=None, out_of_core=None,
+                    client=None, priority=0):
+        """Divide o trabalho em sub-tarefas para distribuição.
+        'rows' divide A em blocos de linhas; 'tiles' divide C em uma grade 2D de tiles,
+        cada um com um painel de linhas de A e um painel de colunas de B (opcionalmente dividido em k).
+        Com scheduling='dynamic' os workers puxam as sub-tarefas da fila quando ficam livres e, em
+        'rows', os blocos são recortados sob demanda com tamanho decrescente (guided self-scheduling).
+        Com 'static' as sub-tarefas são retornadas para envio imediato em round-robin.
+        Matrizes do armazenamento chegam como memmap e os chunks são fatias do arquivo.
+        No modo out-of-core (automático acima de OUT_OF_CORE_RESULT_BYTES) o resultado é um memmap
+        no armazenamento, a decomposição é sempre 'tiles' com blocos limitados a OUT_OF_CORE_BLOCK_BYTES
+        e os painéis de B são lidos do disco a cada envio, sem cópia em memória."""
         try:
             task_id = str(uuid.uuid4())
+            timeout = timeout or DEFAULT_JOB_TIMEOUT
 
             # Verificar se há workers disponíveis
             if len(connected_workers) == 0:
                 raise Exception("Nenhum worker conectado")
 
-            # Validar matrizes antes de processar
-            if not matrix_a or not matrix_b:
-                raise ValueError("Matrizes não podem estar vazias")
-
-            if not isinstance(matrix_a, list) or not isinstance(matrix_b, list):
-                raise ValueError("Matrizes devem ser listas")
-
-            # Calcular tamanho do chunk
-            total_rows = len(matrix_a)
-            if total_rows == 0:
-                raise ValueError("Matriz A não pode ter zero linhas")
+            # Matrizes já validadas por as_matrix (sem cópia se já forem arrays);
+            # os chunks são views codificados no envio
+            array_a, _, _ = as_matrix(matrix_a, 'matrixA')
+            array_b, _, _ = as_matrix(matrix_b, 'matrixB')
+            total_rows = array_a.shape[0]
+            inner, total_cols = array_b.shape
 
             num_workers = len(connected_workers)
-            chunk_size = max(1, total_rows // num_workers)
+
+            result_dtype = np.result_type(array_a.dtype, array_b.dtype)
+            if out_of_core is None:
+                out_of_core = total_rows * total_cols * result_dtype.itemsize > OUT_OF_CORE_RESULT_BYTES
+            # O resultado out-of-core fica no armazenamento com o id da própria tarefa
+            result_ref = uuid.UUID(task_id).hex if out_of_core else None
+            if out_of_core:
+                result_matrix = matrix_store.create(result_ref, (total_rows, total_cols), result_dtype)
+            else:
+                result_matrix = np.zeros((total_rows, total_cols), dtype=result_dtype)
+
+            # Out-of-core sempre usa tiles: blocos de linhas inteiros (e o painel de B inteiro) passariam
+            # do limite de mensagem, então a grade e o k_split saem de OUT_OF_CORE_BLOCK_BYTES
+            if out_of_core:
+                decomposition = 'tiles'
+            carve_rows = decomposition == 'rows' and scheduling == 'dynamic'
+            if decomposition == 'tiles':
+                grid_rows, grid_cols = choose_tile_grid(total_rows, total_cols, num_workers)
+                if out_of_core:
+                    grid_rows, grid_cols, k_split = budget_tile_grid(
+                        total_rows, total_cols, inner, WIRE_ITEM_BYTES, OUT_OF_CORE_BLOCK_BYTES,
+                        grid_rows, grid_cols, k_split)
+                row_ranges = split_range(total_rows, grid_rows)
+                col_ranges = split_range(total_cols, grid_cols)
+                k_ranges = split_range(inner, k_split)
+            elif carve_rows:
+                row_ranges = []
+                col_ranges = [(0, total_cols)]
+                k_ranges = [(0, inner)]
+            else:
+                # Um bloco por worker, proporcional à vazão estimada de cada um
+                worker_ids = list(connected_workers)
+                weighted = weighted_row_ranges(total_rows, [connected_workers[w]['throughput'] for w in worker_ids])
+                row_ranges = [row_range for _, row_range in weighted]
+                row_owners = {row_range: worker_ids[index] for index, row_range in weighted}
+                col_ranges = [(0, total_cols)]
+                k_ranges = [(0, inner)]
+
+            # Painéis de B (um por faixa de colunas x faixa de k), identificados por hash de conteúdo
+            panels = {}
+            for start_col, end_col in col_ranges:
+                for k_start, k_end in k_ranges:
+                    panel = array_b[k_start:k_end, start_col:end_col]
+                    # B inteira vinda do armazenamento já tem o id (mesmo hash de conteúdo)
+                    whole = panel.shape == array_b.shape
+                    panel_id = matrix_b_id if whole and matrix_b_id else matrix_digest(panel)
+                    panels[(start_col, k_start)] = (panel_id, panel)
+
+            task = {
+                'task_id': task_id,
+                'kind': 'matrix',
+                'matrix_a': array_a,
+                'engine': engine,
+                'decomposition': decomposition,
+                'scheduling': scheduling,
+                'k_split': len(k_ranges),
+                'total_rows': total_rows,
+                'total_cols': total_cols,
+                # Próxima linha ainda não recortada (só usada no modo dinâmico por linhas)
+                'next_row': 0 if carve_rows else total_rows,
+                'min_chunk_rows': min_chunk_rows(inner, total_cols),
+                'subtasks': [],
+                'subtask_index': {},
+                'queue': deque(),
+                'running': {},
+                'completed_ids': set(),
+                # Sub-tarefas cujo bloco está sendo copiado no resultado
+                'receiving': set(),
+                # Workers que falharam cada sub-tarefa (um por falha) e a última mensagem de erro
+                'failures': {},
+                'error': None,
+                'matrix_b_ref': panels[(0, 0)][0],
+                'matrix_refs': {matrix_id for matrix_id, _ in panels.values()},
+                'total_subtasks': 0,
+                'completed_subtasks': 0,
+                # Buffer contíguo (ou memmap no modo out-of-core) preenchido por fatia; o dtype segue o das entradas
+                'result_matrix': result_matrix,
+                'result_ref': result_ref,
+                # Com operando esparso, o formato da resposta é escolhido pela densidade do resultado
+                'sparse': isinstance(array_a, CSRMatrix) or isinstance(array_b, CSRMatrix),
+                'result_lock': threading.Lock(),
+                'workers_used': set(),
+                # Blocos finalizados (início/fim de linha e coluna) e filas dos clientes em streaming
+                'finished_blocks': [],
+                'tile_parts': {},
+                'subscribers': [],
+                # Fila entre tarefas: cliente (fair share), prioridade e via pelo trabalho total
+                'client': client,
+                'priority': priority,
+                'lane': job_lane(total_rows * inner * total_cols),
+                'start_time': time.time(),
+                'timeout': timeout,
+                'deadline': time.time() + timeout,
+                'done': threading.Event(),
+                'status': 'pending',
+                # Chave no cache de resultados, preenchida quando a tarefa termina
+                'cache_key': cache_key,
+                'cached': False,
+                # Duração das fases das sub-tarefas (agregada e, por sub-tarefa, na linha do tempo)
+                'phases': {},
+                'timeline': []
+            }
 
             # Criar sub-tarefas
-            subtasks = []
-            for i in range(0, total_rows, chunk_size):
-                end_row = min(i + chunk_size, total_rows)
-                subtask = {
-                    'subtask_id': f"{task_id}_{i}_{end_row}",
-                    'matrix_a_chunk': matrix_a[i:end_row],
-                    'matrix_b': matrix_b,
-                    'start_row': i,
-                    'end_row': end_row,
-                    'chunk_size': end_row - i
-                }
-                subtasks.append(subtask)
+            for start_row, end_row in row_ranges:
+                for start_col, end_col in col_ranges:
+                    for k_start, k_end in k_ranges:
+                        self._add_subtask(task, (start_row, end_row), (start_col, end_col), (k_start, k_end),
+                                          panels[(start_col, k_start)][0])
+
+            assignments = []
+            if scheduling == 'static':
+                if decomposition == 'tiles':
+                    assignments = self._plan_static(task['subtasks'])
+                else:
+                    assignments = [(subtask, row_owners[(subtask['start_row'], subtask['end_row'])])
+                                   for subtask in task['subtasks']]
 
             with self.lock:
-                pending_tasks[task_id] = {
-                    'subtasks': subtasks,
-                    'total_subtasks': len(subtasks),
-                    'completed_subtasks': 0,
-                    'result_matrix': [[0 for _ in range(len(matrix_b[0]))] for _ in range(len(matrix_a))],
-                    'start_time': time.time(),
-                    'status': 'pending'
-                }
-
-            return task_id, subtasks
+                for matrix_id, panel in panels.values():
+                    if not out_of_core and not isinstance(panel, CSRMatrix):
+                        panel = np.ascontiguousarray(panel)
+                    shared = shared_matrices.setdefault(matrix_id, {'matrix': panel, 'tasks': set()})
+                    shared['tasks'].add(task_id)
+                if scheduling == 'dynamic':
+                    task['queue'].extend(task['subtasks'])
+                pending_tasks[task_id] = task
+                for subtask, worker_id in assignments:
+                    if worker_id in connected_workers:
+                        self._assign(task, subtask, connected_workers[worker_id])
+
+            return task_id, assignments
 
         except Exception as e:
             print(f"Erro em create_task: {e}")
             return None, None  # Retornar tupla mesmo em caso de erro
 
-    def complete_subtask(self, task_id, subtask_id, result, start_row):
-        """Marca uma sub-tarefa como completa"""
+    def create_cached_task(self, result, engine='auto', decomposition='rows', scheduling='dynamic', sparse=False):
+        """Registra como concluída uma tarefa cujo resultado veio do cache, sem acionar workers"""
+        task_id = str(uuid.uuid4())
+        now = time.time()
+        total_rows, total_cols = result.shape
+        task = {
+            'task_id': task_id,
+            'kind': 'matrix',
+            'engine': engine,
+            'decomposition': decomposition,
+            'scheduling': scheduling,
+            'total_rows': total_rows,
+            'total_cols': total_cols,
+            'next_row': total_rows,
+            'total_subtasks': 0,
+            'completed_subtasks': 0,
+            'result_matrix': result,
+            'result_ref': None,
+            'sparse': sparse,
+            'workers_used': set(),
+            'finished_blocks': [(0, total_rows, 0, total_cols)],
+            'subscribers': [],
+            'start_time': now,
+            'end_time': now,
+            'timeout': 0,
+            'done': threading.Event(),
+            'status': 'completed',
+            'cache_key': None,
+            'cached': True,
+            'phases': {},
+            'timeline': []
+        }
+        task['done'].set()
+        metrics.inc('matrix_jobs_total', status='cached')
+
+        with self.lock:
+            completed_tasks[task_id] = task
+            self.completed_bytes += retained_bytes(task)
+            self._evict_completed()
+        return task_id
+
+    def create_batch_task(self, pairs, timeout=DEFAULT_JOB_TIMEOUT, client=None, priority=0):
+        """Cria uma tarefa para uma lista de pares (A, B) já validados.
+        Pares do mesmo shape são empilhados e cada sub-tarefa leva uma faixa inteira de pares."""
+        task_id = str(uuid.uuid4())
+        groups = group_pairs(pairs)
+        num_workers = len(connected_workers)
+
+        task = {
+            'task_id': task_id,
+            'kind': 'batch',
+            'matrix_a': None,
+            'engine': 'numpy',
+            'decomposition': 'batch',
+            'scheduling': 'dynamic',
+            'k_split': 1,
+            # Linhas aqui contam pares: não há blocos a recortar sob demanda
+            'total_rows': len(pairs),
+            'total_cols': 0,
+            'next_row': len(pairs),
+            'subtasks': [],
+            'subtask_index': {},
+            'queue': deque(),
+            'running': {},
+            'completed_ids': set(),
+            'receiving': set(),
+            'failures': {},
+            'error': None,
+            'matrix_refs': set(),
+            'total_subtasks': 0,
+            'completed_subtasks': 0,
+            # Um buffer 3D (pares, m, n) por grupo, na ordem de group_pairs
+            'groups': [indices for indices, _, _ in groups],
+            'group_results': [],
+            'result_matrix': None,
+            'result_ref': None,
+            'sparse': False,
+            'result_lock': threading.Lock(),
+            'workers_used': set(),
+            'finished_blocks': [],
+            'tile_parts': {},
+            'subscribers': [],
+            'client': client,
+            'priority': priority,
+            'lane': job_lane(batch_work(pairs)),
+            'start_time': time.time(),
+            'timeout': timeout,
+            'deadline': time.time() + timeout,
+            'done': threading.Event(),
+            'status': 'pending',
+            'cache_key': None,
+            'cached': False,
+            'phases': {},
+            'timeline': []
+        }
+
+        for group, (_, stacked_a, stacked_b) in enumerate(groups):
+            count, rows, inner = stacked_a.shape
+            cols = stacked_b.shape[2]
+            task['group_results'].append(np.zeros((count, rows, cols),
+                                                  dtype=np.result_type(stacked_a.dtype, stacked_b.dtype)))
+            for start, end in batch_ranges(count, rows * inner * cols, num_workers):
+                subtask = {
+                    'task_id': task_id,
+                    'subtask_id': f"{task_id}_b{group}_{start}_{end}",
+                    'kind': 'batch',
+                    'group': group,
+                    'matrix_a_chunk': stacked_a[start:end],
+                    'matrix_b': stacked_b[start:end],
+                    # start_row/end_row são a faixa de pares dentro do grupo
+                    'start_row': start,
+                    'end_row': end,
+                    'start_col': 0,
+                    'end_col': cols,
+                    'k_start': 0,
+                    'k_end': inner,
+                    'pair_rows': rows,
+                    'chunk_size': end - start,
+                    'engine': 'numpy'
+                }
+                task['subtasks'].append(subtask)
+                task['subtask_index'][subtask['subtask_id']] = subtask
+                task['total_subtasks'] += 1
+
+        with self.lock:
+            task['queue'].extend(task['subtasks'])
+            pending_tasks[task_id] = task
+
+        return task_id
 
+    def _add_subtask(self, task, row_range, col_range, k_range, matrix_b_ref):
+        """Cria e registra uma sub-tarefa da tarefa"""
+        task_id = task['task_id']
+        start_row, end_row = row_range
+        start_col, end_col = col_range
+        k_start, k_end = k_range
+
+        if task['decomposition'] == 'tiles':
+            subtask_id = f"{task_id}_t{len(task['subtasks'])}_{start_row}:{start_col}:{k_start}"
+        else:
+            subtask_id = f"{task_id}_{start_row}_{end_row}"
+
+        subtask = {
+            'task_id': task_id,
+            'subtask_id': subtask_id,
+            'kind': 'matrix',
+            'matrix_a_chunk': task['matrix_a'][start_row:end_row, k_start:k_end],
+            'matrix_b_ref': matrix_b_ref,
+            'start_row': start_row,
+            'end_row': end_row,
+            'start_col': start_col,
+            'end_col': end_col,
+            'k_start': k_start,
+            'k_end': k_end,
+            'chunk_size': end_row - start_row,
+            'engine': task['engine']
+        }
+        task['subtasks'].append(subtask)
+        task['subtask_index'][subtask_id] = subtask
+        task['total_subtasks'] += 1
+        return subtask
+
+    def _plan_static(self, subtasks):
+        """Distribui sub-tarefas entre os workers pelo menor tempo estimado de término (LPT)"""
+        throughput = {worker_id: info['throughput'] for worker_id, info in connected_workers.items()}
+        loads = {worker_id: 0.0 for worker_id in throughput}
+        assignments = []
+        for subtask in sorted(subtasks, key=subtask_work, reverse=True):
+            work = subtask_work(subtask)
+            worker_id = min(loads, key=lambda w: (loads[w] + work) / throughput[w])
+            loads[worker_id] += work
+            assignments.append((subtask, worker_id))
+        return assignments
+
+    def _take_subtask(self, task, worker):
+        """Retira a próxima sub-tarefa da fila da tarefa ou recorta um novo bloco de linhas.
+        Uma sub-tarefa que já falhou no worker fica para outro, se houver algum que ainda não a falhou."""
+        for index, subtask in enumerate(task['queue']):
+            failed_by = task['failures'].get(subtask['subtask_id'])
+            if failed_by and worker['worker_id'] in failed_by and any(
+                    other_id not in failed_by and other['status'] != 'unresponsive' and supports_task(other, task)
+                    for other_id, other in connected_workers.items()):
+                continue
+            del task['queue'][index]
+            return subtask
+
+        remaining = task['total_rows'] - task['next_row']
+        if remaining <= 0:
+            return None
+
+        # Bloco proporcional à fração da capacidade do cluster que o worker representa
+        total_throughput = sum(info['throughput'] for info in connected_workers.values())
+        share = worker['throughput'] / total_throughput if total_throughput > 0 else 1 / len(connected_workers)
+        size = guided_chunk_size(remaining, share, task['min_chunk_rows'])
+        row_work = task['matrix_a'].shape[1] * task['total_cols']
+        size = min(size, max(task['min_chunk_rows'], int(worker['throughput'] * MAX_CHUNK_SECONDS) // max(1, row_work)))
+        start_row = task['next_row']
+        task['next_row'] = start_row + size
+        return self._add_subtask(task, (start_row, start_row + size), (0, task['total_cols']),
+                                 (0, task['matrix_a'].shape[1]), task['matrix_b_ref'])
+
+    def next_subtask(self, worker_id):
+        """Atribui ao worker a próxima sub-tarefa pendente (tarefas na ordem de _schedule_order).
+        Sem trabalho novo, duplica especulativamente a sub-tarefa mais atrasada."""
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            if worker is None or worker['status'] == 'unresponsive' or len(worker['inflight']) >= worker['slots']:
+                return None
+
+            for task in self._schedule_order():
+                if not supports_task(worker, task):
+                    continue
+                subtask = self._take_subtask(task, worker)
+                if subtask is not None:
+                    self._assign(task, subtask, worker)
+                    return subtask
+
+            subtask = self._speculative_subtask(worker)
+            if subtask is not None:
+                self._assign(pending_tasks[subtask['task_id']], subtask, worker)
+                print(f"Execução especulativa de {subtask['subtask_id']} em {worker_id}")
+            return subtask
+
+    def _schedule_order(self):
+        """Tarefas pendentes na ordem de atendimento: via rápida, prioridade, trabalho em execução
+        do cliente (fair share: cada sub-tarefa vai para o cliente com a menor fatia do cluster)
+        e ordem de chegada. Recalculada a cada atribuição; o trabalho em execução vem do contador
+        client_running, mantido em _start_running/_stop_running."""
+        usage = self.client_running
+        return sorted(pending_tasks.values(), key=lambda task: (job_class(task['lane'], task['priority']),
+                                                                usage.get(task['client'], 0), task['start_time']))
+
+    def estimate_wait(self, work, client, priority):
+        """Estimativa (segundos) até uma nova tarefa de `work` terminar e até a fila à frente dela esvaziar.
+        À frente ficam as tarefas de classe superior e as do próprio cliente, inteiras; na mesma classe,
+        cada outro cliente só até `work` (o fair share divide o cluster entre eles).
+        Retorna (espera total, espera da fila); infinito sem workers."""
+        job_key = job_class(job_lane(work), priority)
+        with self.lock:
+            capacity = sum(worker['throughput'] for worker in connected_workers.values()
+                           if worker['status'] != 'unresponsive')
+            ahead = 0
+            others = defaultdict(int)
+            for task in pending_tasks.values():
+                task_key = job_class(task['lane'], task['priority'])
+                if task_key > job_key:
+                    continue
+                if task_key < job_key or task['client'] == client:
+                    ahead += remaining_work(task)
+                else:
+                    others[task['client']] += remaining_work(task)
+            ahead += sum(min(remaining, work) for remaining in others.values())
+
+        if capacity <= 0:
+            return math.inf, math.inf
+        return (ahead + work) / capacity, ahead / capacity
+
+    def queue_stats(self):
+        """Trabalho pendente e em execução por cliente, e a fila total em segundos de cluster"""
+        with self.lock:
+            capacity = sum(worker['throughput'] for worker in connected_workers.values()
+                           if worker['status'] != 'unresponsive')
+            clients = {}
+            for task in pending_tasks.values():
+                stats = clients.setdefault(str(task['client']), {'jobs': 0, 'remaining_work': 0, 'running_subtasks': 0})
+                stats['jobs'] += 1
+                stats['remaining_work'] += remaining_work(task)
+                stats['running_subtasks'] += len(task['running'])
+        backlog = sum(stats['remaining_work'] for stats in clients.values())
+        return {'clients': clients, 'backlog_seconds': backlog / capacity if capacity else None}
+
+    def _speculative_subtask(self, worker):
+        """Escolhe a sub-tarefa em execução (em um único worker) mais atrasada em relação ao esperado"""
+        now = time.time()
+        best = None
+        for task in pending_tasks.values():
+            if not supports_task(worker, task):
+                continue
+            for subtask_id, runners in task['running'].items():
+                if len(runners) != 1 or worker['worker_id'] in runners:
+                    continue
+
+                runner_id, assigned_at = next(iter(runners.items()))
+                runner = connected_workers.get(runner_id)
+                subtask = task['subtask_index'][subtask_id]
+                elapsed = now - assigned_at
+                # Com vários slots, a sub-tarefa pode ter esperado na fila do worker atrás das outras
+                expected = subtask_work(subtask) / runner['throughput'] * runner['slots'] if runner else 0
+                if elapsed < max(SPECULATION_MIN_SECONDS, SPECULATION_FACTOR * expected):
+                    continue
+
+                delay = elapsed - expected
+                if best is None or delay > best[0]:
+                    best = (delay, subtask)
+
+        return best[1] if best else None
+
+    def _assign(self, task, subtask, worker):
+        if subtask['subtask_id'] not in task['running']:
+            self._start_running(task, subtask['subtask_id'])
+        task['running'][subtask['subtask_id']][worker['worker_id']] = time.time()
+        worker['inflight'][subtask['subtask_id']] = task['task_id']
+        self._update_status(worker)
+
+    def _start_running(self, task, subtask_id):
+        """Sub-tarefa entra em execução (chamado com o lock)"""
+        task['running'][subtask_id] = {}
+        self.client_running[task['client']] += subtask_work(task['subtask_index'][subtask_id])
+
+    def _stop_running(self, task, subtask_id):
+        """Sub-tarefa sai de execução: concluída, devolvida à fila ou tarefa encerrada (chamado com o lock)"""
+        if task['running'].pop(subtask_id, None) is None:
+            return
+        client = task['client']
+        self.client_running[client] -= subtask_work(task['subtask_index'][subtask_id])
+        if self.client_running[client] <= 0:
+            del self.client_running[client]
+
+    def _update_status(self, worker):
+        if worker['status'] != 'unresponsive':
+            worker['status'] = 'busy' if len(worker['inflight']) >= worker['slots'] else 'available'
+
+    def requeue_worker_subtasks(self, worker_id, remove=False):
+        """Devolve à fila as sub-tarefas do worker que não estão rodando em nenhum outro.
+        Com remove=True o worker também sai de connected_workers (desconexão)."""
+        requeued = 0
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            if worker is None:
+                return 0
+
+            for subtask_id, task_id in worker['inflight'].items():
+                task = pending_tasks.get(task_id)
+                if task is None or subtask_id not in task['running']:
+                    continue
+
+                runners = task['running'][subtask_id]
+                runners.pop(worker_id, None)
+                if not runners:
+                    self._stop_running(task, subtask_id)
+                    task['queue'].appendleft(task['subtask_index'][subtask_id])
+                    requeued += 1
+
+            worker['inflight'].clear()
+            self._update_status(worker)
+            if remove:
+                del connected_workers[worker_id]
+
+        return requeued
+
+    def touch_worker(self, worker_id):
+        """Renova o lease do worker; um worker dado como inativo volta a receber trabalho"""
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            if worker is None:
+                return False
+            worker['last_seen'] = time.time()
+            if worker['status'] == 'unresponsive':
+                worker['status'] = 'available'
+                self._update_status(worker)
+                print(f"Worker {worker_id} voltou a responder")
+            return True
+
+    def expire_leases(self):
+        """Marca como inativos os workers sem sinal dentro do prazo e reatribui suas sub-tarefas"""
+        now = time.time()
+        with self.lock:
+            expired = [worker_id for worker_id, info in connected_workers.items()
+                       if info['status'] != 'unresponsive' and now - info['last_seen'] > HEARTBEAT_TIMEOUT]
+            for worker_id in expired:
+                connected_workers[worker_id]['status'] = 'unresponsive'
+
+        for worker_id in expired:
+            requeued = self.requeue_worker_subtasks(worker_id)
+            print(f"ERRO - Worker {worker_id} sem heartbeat; {requeued} sub-tarefas reatribuídas")
+        return expired
+
+    def record_throughput(self, worker_id, task_id, subtask_id, execution_time):
+        """Atualiza a vazão estimada do worker (multiplicações-somas por segundo, média exponencial)"""
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            task = pending_tasks.get(task_id)
+            subtask = task['subtask_index'].get(subtask_id) if task else None
+            if worker is None or subtask is None or not execution_time or execution_time <= 0:
+                return
+
+            sample = subtask_work(subtask) / execution_time
+            if worker['throughput_samples'] == 0:
+                worker['throughput'] = sample
+            else:
+                worker['throughput'] += THROUGHPUT_SMOOTHING * (sample - worker['throughput'])
+            worker['throughput_samples'] += 1
+
+    def release_worker(self, worker_id, subtask_id):
+        """Libera o slot do worker após a conclusão de uma sub-tarefa"""
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            if worker is not None:
+                worker['inflight'].pop(subtask_id, None)
+                self._update_status(worker)
+
+    def fail_subtask(self, task_id, subtask_id, worker_id, error):
+        """Sub-tarefa que falhou no worker: libera o slot e a devolve à fila se ninguém mais a executa.
+        Após MAX_SUBTASK_FAILURES falhas da mesma sub-tarefa a tarefa é encerrada como 'failed'."""
+        with self.lock:
+            worker = connected_workers.get(worker_id)
+            if worker is not None:
+                worker['inflight'].pop(subtask_id, None)
+                self._update_status(worker)
+            task = pending_tasks.get(task_id)
+            if task is not None and subtask_id in task['subtask_index']:
+                self._fail_subtask(task, subtask_id, worker_id, error)
+
+    def _fail_subtask(self, task, subtask_id, worker_id, error):
+        """Parte de fail_subtask que age sobre a tarefa (chamada com o lock)"""
+        print(f"ERRO - Sub-tarefa {subtask_id} falhou em {worker_id}: {error}")
+        if subtask_id in task['completed_ids'] or subtask_id in task['receiving']:
+            return
+
+        task['error'] = str(error)
+        failed_by = task['failures'].setdefault(subtask_id, [])
+        failed_by.append(worker_id)
+        if len(failed_by) >= MAX_SUBTASK_FAILURES:
+            self._finish_task(task['task_id'], 'failed')
+            print(f"ERRO - Tarefa {task['task_id']} encerrada após {MAX_SUBTASK_FAILURES} falhas de {subtask_id}")
+            return
+
+        # Fora de execução a sub-tarefa já voltou à fila (lease expirado ou reconexão)
+        runners = task['running'].get(subtask_id)
+        if runners is None:
+            return
+        runners.pop(worker_id, None)
+        if not runners:
+            self._stop_running(task, subtask_id)
+            task['queue'].appendleft(task['subtask_index'][subtask_id])
+
+    def build_payload(self, subtask, worker):
+        """Monta o payload de execute_task no formato negociado com o worker.
+        A matriz B só é incluída se o worker ainda não a tiver em cache."""
+        wire_format = worker['wire_format']
+        codecs = worker['codecs']
+        payload = dict(subtask)
+        payload['wire_format'] = wire_format
+
+        # Lote: os dois operandos empilhados (3D) vão inline
+        if subtask['kind'] == 'batch':
+            payload['matrix_a_chunk'] = encode_matrix(subtask['matrix_a_chunk'], wire_format,
+                                                      codecs, payload_compression)
+            payload['matrix_b'] = encode_matrix(subtask['matrix_b'], wire_format, codecs, payload_compression)
+            return payload
+
+        matrix_b_ref = subtask['matrix_b_ref']
+
+        # Workers sem suporte a CSR recebem os blocos esparsos densificados
+        supports_sparse = worker['capabilities'].get('sparse', False)
+
+        payload['matrix_a_chunk'] = encode_matrix(densify_unless(subtask['matrix_a_chunk'], supports_sparse),
+                                                  wire_format, codecs, payload_compression)
+
+        supports_cache = worker['capabilities'].get('matrix_cache', False)
+        if not supports_cache or matrix_b_ref not in worker['cached_matrices']:
+            payload['matrix_b'] = encode_matrix(densify_unless(self.get_shared_matrix(matrix_b_ref), supports_sparse),
+                                                wire_format, codecs, payload_compression)
+            if supports_cache:
+                worker['cached_matrices'].add(matrix_b_ref)
+
+        return payload
+
+    def get_shared_matrix(self, matrix_id):
+        """Retorna uma matriz compartilhada pelo hash (ou None); matrizes do armazenamento
+        continuam disponíveis mesmo sem tarefa em andamento"""
+        with self.lock:
+            shared = shared_matrices.get(matrix_id)
+            if shared:
+                return shared['matrix']
+        if matrix_id in matrix_store:
+            return matrix_store.get(matrix_id)
+        return None
+
+    def release_shared_matrix(self, task_id, matrix_id):
+        """Remove a referência da tarefa e descarta a matriz quando não houver mais uso"""
+        shared = shared_matrices.get(matrix_id)
+        if shared:
+            shared['tasks'].discard(task_id)
+            if not shared['tasks']:
+                del shared_matrices[matrix_id]
+
+    def complete_subtask(self, task_id, subtask_id, result, start_row, worker_id=None,
+                         spans=None, received_at=None):
+        """Marca uma sub-tarefa como completa.
+        O bloco é copiado no buffer do resultado fora do lock global: a sub-tarefa é reservada
+        sob o lock, a cópia é feita por fatia e só então os contadores são atualizados.
+        `spans` são as fases medidas (subtask_spans); a cópia entra como 'assemble'."""
         with self.lock:
-            if task_id in pending_tasks:
-                task = pending_tasks[task_id]
-
-                # Inserir resultado na posição correta
-                try:
-                    for i, row in enumerate(result):
-                        if start_row + i < len(task['result_matrix']):
-                            task['result_matrix'][start_row + i] = row
-                        else:
-                            print(
-                                f"ERRO - Índice fora dos limites: start_row={start_row}, i={i}, len={len(task['result_matrix'])}")
-                            return False
-
-                    task['completed_subtasks'] += 1
-
-                    # Verificar se tarefa está completa
-                    if task['completed_subtasks'] >= task['total_subtasks']:
-                        task['status'] = 'completed'
-                        task['end_time'] = time.time()
-                        completed_tasks[task_id] = pending_tasks.pop(task_id)
-                        print(f"SUCESSO - Tarefa {task_id} totalmente completa!")
-                        return True
-
-                except Exception as e:
-                    print(f"ERRO - Erro ao inserir resultado: {e}")
-                    return False
+            if task_id not in pending_tasks:
+                if task_id not in completed_tasks:
+                    print(f"ERRO - Task ID {task_id} não encontrado em pending_tasks")
+                return False
+
+            task = pending_tasks[task_id]
+            subtask = task['subtask_index'].get(subtask_id)
+            if subtask is None:
+                print(f"ERRO - Sub-tarefa {subtask_id} não pertence à tarefa {task_id}")
+                return False
+
+            # Execuções especulativas ou reatribuídas: vale o primeiro resultado
+            if subtask_id in task['completed_ids'] or subtask_id in task['receiving']:
+                print(f"Resultado duplicado de {subtask_id} ignorado")
+                return False
+            task['receiving'].add(subtask_id)
+
+        start_row, end_row = subtask['start_row'], subtask['end_row']
+        start_col, end_col = subtask['start_col'], subtask['end_col']
+        if task['kind'] == 'batch':
+            # Lote: a faixa de pares do grupo no buffer 3D
+            buffer = task['group_results'][subtask['group']]
+            target = buffer[start_row:end_row]
+        else:
+            buffer = task['result_matrix']
+            target = buffer[start_row:end_row, start_col:end_col]
+        assemble_start = time.perf_counter()
+        try:
+            # Payloads binários já chegam como array; JSON é convertido uma única vez
+            block = result if isinstance(result, CSRMatrix) else np.asarray(result, dtype=buffer.dtype)
+            if tuple(block.shape) != target.shape:
+                print(f"ERRO - Bloco com dimensões inesperadas para {subtask_id}: esperado {target.shape}")
+                block = None
+            elif isinstance(block, CSRMatrix):
+                # Bloco esparso: somar só os não-zeros (a região começa zerada)
+                with task['result_lock']:
+                    block.add_to(target)
+            elif task['k_split'] > 1:
+                # Parcelas em k do mesmo tile são somadas
+                with task['result_lock']:
+                    target += block
             else:
-                print(f"ERRO - Task ID {task_id} não encontrado em pending_tasks")
+                target[...] = block
+        except Exception as e:
+            print(f"ERRO - Erro ao inserir resultado: {e}")
+            block = None
+        assemble = time.perf_counter() - assemble_start
+
+        with self.lock:
+            task['receiving'].discard(subtask_id)
+            if task_id not in pending_tasks:
+                return False
+            if block is None:
+                self._fail_subtask(task, subtask_id, worker_id, 'resultado inválido')
+                return False
+
+            if spans is not None:
+                self._record_timings(task, subtask_id, worker_id, dict(spans, assemble=assemble),
+                                     received_at or time.time())
+
+            task['completed_subtasks'] += 1
+            if worker_id:
+                task['workers_used'].add(worker_id)
+
+            # Com divisão em k, o tile só está pronto quando todas as parcelas chegarem
+            tile_ready = True
+            if task['k_split'] > 1:
+                tile_key = (start_row, start_col)
+                task['tile_parts'][tile_key] = task['tile_parts'].get(tile_key, task['k_split']) - 1
+                tile_ready = task['tile_parts'][tile_key] == 0
+            if tile_ready and task['kind'] == 'matrix':
+                self._publish(task, (start_row, end_row, start_col, end_col))
+
+            task['completed_ids'].add(subtask_id)
+            self._stop_running(task, subtask_id)
+            if subtask in task['queue']:
+                task['queue'].remove(subtask)
+
+            # Verificar se tarefa está completa (inclusive sem linhas ainda por recortar)
+            if (task['completed_subtasks'] >= task['total_subtasks'] and not task['queue']
+                    and task['next_row'] >= task['total_rows']):
+                self._finish_task(task_id, 'completed')
+                print(f"SUCESSO - Tarefa {task_id} totalmente completa!")
+                return True
 
         return False
 
+    def _record_timings(self, task, subtask_id, worker_id, spans, received_at):
+        """Registra as fases de um resultado aceito: histogramas por worker,
+        resumo da tarefa e uma entrada na linha do tempo (chamado com o lock)"""
+        for phase, value in spans.items():
+            metrics.observe('matrix_subtask_phase_seconds', value, phase=phase, worker=worker_id)
+            summary = task['phases'].setdefault(phase, {'count': 0, 'total': 0.0, 'max': 0.0})
+            summary['count'] += 1
+            summary['total'] += value
+            summary['max'] = max(summary['max'], value)
+        metrics.inc('matrix_subtasks_completed_total', worker=worker_id)
+
+        if len(task['timeline']) < MAX_TIMELINE_ENTRIES:
+            task['timeline'].append({'subtask_id': subtask_id, 'worker_id': worker_id,
+                                     'received': received_at - task['start_time'], **spans})
+
+    def _publish(self, task, block):
+        task['finished_blocks'].append(block)
+        for updates in task['subscribers']:
+            updates.put(block)
+
+    def subscribe(self, task_id):
+        """Fila com os blocos já finalizados e os próximos, terminando em None quando a tarefa acabar"""
+        updates = queue.Queue()
+        with self.lock:
+            task = pending_tasks.get(task_id) or completed_tasks.get(task_id)
+            if task is None:
+                return None
+            for block in task['finished_blocks']:
+                updates.put(block)
+            if task['status'] == 'pending':
+                task['subscribers'].append(updates)
+            else:
+                updates.put(None)
+        return updates
+
+    def unsubscribe(self, task_id, updates):
+        """Remove a fila de um cliente em streaming"""
+        with self.lock:
+            task = pending_tasks.get(task_id) or completed_tasks.get(task_id)
+            if task is not None and updates in task['subscribers']:
+                task['subscribers'].remove(updates)
+
+    def _finish_task(self, task_id, status):
+        task = pending_tasks.pop(task_id)
+        task['status'] = status
+        task['end_time'] = time.time()
+        task['queue'].clear()
+        for subtask_id in list(task['running']):
+            self._stop_running(task, subtask_id)
+        # Cópias ainda em execução não ocupam mais slots: seus resultados serão ignorados
+        for worker in connected_workers.values():
+            finished = [subtask_id for subtask_id, owner in worker['inflight'].items() if owner == task_id]
+            for subtask_id in finished:
+                del worker['inflight'][subtask_id]
+            if finished:
+                self._update_status(worker)
+        # Liberar A e as views das sub-tarefas; só o resultado fica guardado
+        task['matrix_a'] = None
+        task['subtasks'] = []
+        task['subtask_index'] = {}
+        # Resultado out-of-core: publicado no armazenamento (ou descartado) em vez de ficar na memória
+        if task['result_ref'] is not None:
+            if status == 'completed':
+                matrix_store.commit(task['result_ref'])
+            else:
+                matrix_store.discard(task['result_ref'])
+        completed_tasks[task_id] = task
+        self.completed_bytes += retained_bytes(task)
+        self._evict_completed()
+        metrics.observe('matrix_job_duration_seconds', task['end_time'] - task['start_time'], status=status)
+        metrics.inc('matrix_jobs_total', status=status)
+        if status == 'completed' and task['cache_key'] is not None and task['result_ref'] is None:
+            result_cache.put(task['cache_key'], task['result_matrix'])
+        for matrix_id in task['matrix_refs']:
+            self.release_shared_matrix(task_id, matrix_id)
+        for updates in task['subscribers']:
+            updates.put(None)
+        task['subscribers'].clear()
+        task['done'].set()
+
+    def finish_task(self, task_id, status):
+        """Encerra uma tarefa pendente ('cancelled' ou 'timeout'); resultados atrasados serão ignorados"""
+        with self.lock:
+            if task_id not in pending_tasks:
+                return False
+            self._finish_task(task_id, status)
+
+        print(f"Tarefa {task_id} encerrada: {status}")
+        return True
+
+    def expire_jobs(self):
+        """Encerra as tarefas que passaram do prazo"""
+        now = time.time()
+        with self.lock:
+            expired = [task_id for task_id, task in pending_tasks.items() if task['deadline'] < now]
+        for task_id in expired:
+            self.finish_task(task_id, 'timeout')
+        return expired
+
+    def _evict_completed(self):
+        now = time.time()
+        while completed_tasks:
+            task_id, task = next(iter(completed_tasks.items()))
+            expired = now - task['end_time'] > COMPLETED_TASK_TTL
+            # A mais recente fica mesmo acima do limite, para o cliente conseguir buscar o resultado
+            over_budget = self.completed_bytes > COMPLETED_TASKS_MAX_BYTES and len(completed_tasks) > 1
+            if not expired and not over_budget:
+                break
+            del completed_tasks[task_id]
+            self.completed_bytes -= retained_bytes(task)
+
+    def evict_completed_tasks(self):
+        """Remove tarefas finalizadas antigas ou acima do limite de memória"""
+        with self.lock:
+            self._evict_completed()
+
+    def discard_task(self, task_id):
+        """Descarta uma tarefa finalizada cujo resultado não será mais pedido (ex.: intermediários de uma cadeia)"""
+        with self.lock:
+            task = completed_tasks.pop(task_id, None)
+            if task is None:
+                return False
+            self.completed_bytes -= retained_bytes(task)
+        if task['result_ref'] is not None:
+            matrix_store.delete(task['result_ref'])
+        return True
+
+    def get_task(self, task_id):
+        """Retorna a tarefa, pendente ou finalizada (ou None)"""
+        with self.lock:
+            return pending_tasks.get(task_id) or completed_tasks.get(task_id)
+
+
+def densify_unless(matrix, supports_sparse):
+    """Converte CSR em array denso para workers que não aceitam matrizes esparsas"""
+    if isinstance(matrix, CSRMatrix) and not supports_sparse:
+        return matrix.toarray()
+    return matrix
+
+
+def subtask_spans(data, received_at):
+    """Duração de cada fase (SUBTASK_PHASES) a partir das marcas devolvidas pelo worker.
+    dispatch e return comparam relógios do servidor e do worker (valores negativos viram 0).
+    Workers sem marcas informam só o cálculo; 'assemble' é medido em complete_subtask."""
+    timings = data.get('timings') or {}
+    spans = {'compute': data.get('execution_time')}
+    if 'finished_at' in timings:
+        spans.update({
+            'serialize': timings.get('serialize'),
+            'dispatch': timings['received_at'] - timings['sent_at'],
+            'queue': timings['started_at'] - timings['received_at'],
+            'return': received_at - timings['finished_at']
+        })
+    return {phase: max(0.0, spans[phase]) for phase in SUBTASK_PHASES
+            if isinstance(spans.get(phase), (int, float))}
+
+
+def phase_summary(task):
+    """Resumo das fases de uma tarefa: quantidade, total, média e máximo (segundos)"""
+    return {phase: dict(summary, mean=summary['total'] / summary['count'])
+            for phase, summary in task['phases'].items()}
+
+
+def retained_bytes(task):
+    """Memória ocupada pelo resultado de uma tarefa finalizada (memmaps ficam em disco)"""
+    if task['kind'] == 'batch':
+        return sum(result.nbytes for result in task['group_results'])
+    return 0 if task['result_ref'] is not None else task['result_matrix'].nbytes
+
+
+def job_lane(work):
+    """Via da tarefa pelo trabalho total: 'fast' para as pequenas"""
+    return 'fast' if work <= FAST_LANE_WORK else 'normal'
+
+
+def job_class(lane, priority):
+    """Chave de ordenação da classe da tarefa (menor é atendida antes)"""
+    return lane != 'fast', -priority
+
+
+def batch_work(pairs):
+    """Trabalho de um lote em multiplicações-somas"""
+    return sum(a.shape[0] * a.shape[1] * b.shape[1] for a, b in pairs)
+
+
+def remaining_work(task):
+    """Trabalho ainda não concluído: sub-tarefas na fila ou em execução e linhas ainda não recortadas"""
+    subtasks = list(task['queue']) + [task['subtask_index'][subtask_id] for subtask_id in task['running']]
+    work = sum(subtask_work(subtask) for subtask in subtasks)
+    if task['kind'] == 'matrix':
+        work += (task['total_rows'] - task['next_row']) * task['matrix_a'].shape[1] * task['total_cols']
+    return work
+
+
+def subtask_work(subtask):
+    """Trabalho de uma sub-tarefa em multiplicações-somas (linhas x colunas x k; em lotes, x linhas de cada par)"""
+    return ((subtask['end_row'] - subtask['start_row']) * (subtask['end_col'] - subtask['start_col'])
+            * (subtask['k_end'] - subtask['k_start']) * subtask.get('pair_rows', 1))
+
+
+def supports_task(worker, task):
+    """Tarefas em lote só vão para workers que anunciam a capacidade 'batch'"""
+    return task['kind'] != 'batch' or worker['capabilities'].get('batch', False)
+
+
 task_manager = TaskManager()
+monitor_lock = threading.Lock()
+lease_monitor_started = False
+
+
+def send_subtask(subtask, worker_id):
+    """Codifica e envia uma sub-tarefa ao worker"""
+    worker = connected_workers.get(worker_id)
+    if worker is None:
+        return False
+    start = time.perf_counter()
+    payload = task_manager.build_payload(subtask, worker)
+    # Marcas devolvidas pelo worker em task_completed para medir as fases
+    payload['timings'] = {'serialize': time.perf_counter() - start, 'sent_at': time.time()}
+    socketio.emit('execute_task', payload, room=worker['session_id'])
+    return True
+
+
+def dispatch_to_worker(worker_id):
+    """Envia sub-tarefas pendentes ao worker enquanto ele tiver slots livres"""
+    dispatched = 0
+    while True:
+        subtask = task_manager.next_subtask(worker_id)
+        if subtask is None or not send_subtask(subtask, worker_id):
+            return dispatched
+        dispatched += 1
+
+
+def lease_monitor():
+    """Reatribui sub-tarefas de workers sem heartbeat e dispara execuções especulativas"""
+    while True:
+        socketio.sleep(MONITOR_INTERVAL)
+        try:
+            task_manager.expire_leases()
+            probe_unresponsive()
+            task_manager.expire_jobs()
+            task_manager.evict_completed_tasks()
+            if pending_tasks:
+                dispatch_available()
+        except Exception as e:
+            print(f"ERRO no monitor de leases: {e}")
+
+
+def probe_unresponsive():
+    """Pergunta aos workers inativos ainda conectados se estão vivos: o ack (que qualquer cliente
+    Socket.IO envia) renova o lease, e o worker volta a receber trabalho sem precisar reconectar.
+    Sessões mortas não respondem e são encerradas pelo timeout de ping do Engine.IO."""
+    for worker_id, info in list(connected_workers.items()):
+        if info['status'] == 'unresponsive':
+            socketio.emit('lease_probe', {'worker_id': worker_id}, to=info['session_id'],
+                          callback=lambda *_, worker_id=worker_id: handle_lease_probe_ack(worker_id))
+
+
+def handle_lease_probe_ack(worker_id):
+    if task_manager.touch_worker(worker_id):
+        dispatch_to_worker(worker_id)
+
+
+def start_lease_monitor():
+    """Inicia o monitor de leases uma única vez"""
+    global lease_monitor_started
+    with monitor_lock:
+        if not lease_monitor_started:
+            lease_monitor_started = True
+            socketio.start_background_task(lease_monitor)
+
+
+def dispatch_available():
+    """Distribui trabalho pendente para todos os workers livres, um slot por worker a cada rodada:
+    todos recebem uma sub-tarefa antes de algum receber a próxima antecipadamente"""
+    while True:
+        dispatched = 0
+        for worker_id, info in list(connected_workers.items()):
+            if info['status'] == 'available':
+                subtask = task_manager.next_subtask(worker_id)
+                if subtask is not None and send_subtask(subtask, worker_id):
+                    dispatched += 1
+        if not dispatched:
+            return
 
 
 @app.route('/')
@@ -136,79 +1160,590 @@ def index():
     return render_template('home.html')
 
 
+def resolve_operand(value, name):
+    """Operando de um pedido: matriz inline ou referência ao armazenamento ({"ref": id}).
+    Retorna (matriz, id no armazenamento ou None)"""
+    if isinstance(value, dict) and 'ref' in value:
+        matrix = matrix_store.get(value['ref'])
+        if matrix is None:
+            raise ValueError(f"{name} referencia uma matriz inexistente: {value['ref']}")
+        return matrix, value['ref']
+    return value, None
+
+
+def parse_job_request():
+    """Valida o corpo JSON de um pedido de multiplicação.
+    Retorna (opções, None) ou (None, resposta de erro)"""
+    if not request.is_json:
+        return None, (jsonify({'error': 'Content-Type deve ser application/json'}), 400)
+
+    data = request.get_json()
+
+    if not data or 'matrixA' not in data or 'matrixB' not in data:
+        return None, (jsonify({'error': 'JSON deve conter matrixA e matrixB'}), 400)
+
+    # Validar e converter uma única vez; os arrays seguem por todo o pipeline
+    try:
+        matrix_a, matrix_a_id = resolve_operand(data['matrixA'], 'matrixA')
+        matrix_b, matrix_b_id = resolve_operand(data['matrixB'], 'matrixB')
+        matrix_a, shape_a, _ = as_matrix(matrix_a, 'matrixA')
+        matrix_b, shape_b, _ = as_matrix(matrix_b, 'matrixB')
+    except ValueError as e:
+        return None, (jsonify({'error': f'Matrizes inválidas: {e}'}), 400)
+
+    if shape_a[1] != shape_b[0]:
+        return None, (jsonify({'error': 'Dimensões incompatíveis para multiplicação'}), 400)
+
+    sparse = isinstance(matrix_a, CSRMatrix) or isinstance(matrix_b, CSRMatrix)
+    if sparse and not dense_result_fits(shape_a[0], shape_b[1]):
+        return None, (jsonify({'error': f'Resultado de produto esparso acima de {MAX_SPARSE_ELEMENTS} elementos'}), 400)
+
+    engine = data.get('engine', 'auto')
+    if engine != 'auto' and engine not in ENGINES:
+        return None, (jsonify({'error': f"Engine inválido. Opções: {['auto'] + list(ENGINES)}"}), 400)
+
+    decomposition = data.get('decomposition', 'rows')
+    if decomposition not in ('rows', 'tiles'):
+        return None, (jsonify({'error': "decomposition deve ser 'rows' ou 'tiles'"}), 400)
+
+    k_split = data.get('kSplit', 1)
+    if isinstance(k_split, bool) or not isinstance(k_split, int) or k_split < 1:
+        return None, (jsonify({'error': 'kSplit deve ser um inteiro positivo'}), 400)
+
+    scheduling = data.get('scheduling', 'dynamic')
+    if scheduling not in ('dynamic', 'static'):
+        return None, (jsonify({'error': "scheduling deve ser 'dynamic' ou 'static'"}), 400)
+
+    timeout, error = parse_timeout(data)
+    if error:
+        return None, error
+
+    stream = data.get('stream', False)
+    if not isinstance(stream, bool):
+        return None, (jsonify({'error': 'stream deve ser booleano'}), 400)
+
+    # None escolhe pelo tamanho do resultado
+    out_of_core = data.get('outOfCore')
+    if out_of_core is not None and not isinstance(out_of_core, bool):
+        return None, (jsonify({'error': 'outOfCore deve ser booleano'}), 400)
+
+    timeline = data.get('timeline', False)
+    if not isinstance(timeline, bool):
+        return None, (jsonify({'error': 'timeline deve ser booleano'}), 400)
+
+    dtype, error = parse_dtype(data)
+    if error:
+        return None, error
+
+    priority, error = parse_priority(data)
+    if error:
+        return None, error
+
+    return {
+        'matrix_a': matrix_a,
+        'matrix_b': matrix_b,
+        'matrix_a_id': matrix_a_id,
+        'matrix_b_id': matrix_b_id,
+        'engine': engine,
+        'decomposition': decomposition,
+        'k_split': k_split,
+        'scheduling': scheduling,
+        'timeout': timeout,
+        'stream': stream,
+        'out_of_core': out_of_core,
+        'timeline': timeline,
+        'dtype': dtype,
+        'client': request_client(),
+        'priority': priority,
+        'sparse': sparse
+    }, None
+
+
+def parse_chain_request():
+    """Valida um pedido de produto em cadeia: {"matrices": [M0, M1, ...], "engine"?, "timeout"?}.
+    Retorna (opções, None) ou (None, resposta de erro)"""
+    if not request.is_json:
+        return None, (jsonify({'error': 'Content-Type deve ser application/json'}), 400)
+
+    data = request.get_json()
+    matrices = data.get('matrices') if isinstance(data, dict) else None
+    if not isinstance(matrices, list) or len(matrices) < 2:
+        return None, (jsonify({'error': 'JSON deve conter uma lista matrices com pelo menos duas matrizes'}), 400)
+
+    # Cada operando é (matriz, id no armazenamento ou None)
+    operands = []
+    try:
+        for index, value in enumerate(matrices):
+            matrix, matrix_id = resolve_operand(value, f'matrices[{index}]')
+            matrix, shape, _ = as_matrix(matrix, f'matrices[{index}]')
+            if operands and operands[-1][0].shape[1] != shape[0]:
+                return None, (jsonify({'error': f'Dimensões incompatíveis entre matrices[{index - 1}] '
+                                                f'e matrices[{index}]'}), 400)
+            operands.append((matrix, matrix_id))
+    except ValueError as e:
+        return None, (jsonify({'error': f'Matrizes inválidas: {e}'}), 400)
+
+    # Com operando esparso, qualquer produto parcial Mi···Mj (i < j) pode ser montado denso
+    if any(isinstance(matrix, CSRMatrix) for matrix, _ in operands):
+        for i, (first, _) in enumerate(operands):
+            for last, _ in operands[i + 1:]:
+                if not dense_result_fits(first.shape[0], last.shape[1]):
+                    return None, (jsonify({'error': f'Resultado de produto esparso acima de '
+                                                    f'{MAX_SPARSE_ELEMENTS} elementos'}), 400)
+
+    engine = data.get('engine', 'auto')
+    if engine != 'auto' and engine not in ENGINES:
+        return None, (jsonify({'error': f"Engine inválido. Opções: {['auto'] + list(ENGINES)}"}), 400)
+
+    timeout, error = parse_timeout(data)
+    if error:
+        return None, error
+
+    dtype, error = parse_dtype(data)
+    if error:
+        return None, error
+
+    priority, error = parse_priority(data)
+    if error:
+        return None, error
+
+    return {'operands': operands, 'engine': engine, 'timeout': timeout, 'dtype': dtype,
+            'client': request_client(), 'priority': priority}, None
+
+
+def parse_timeout(data):
+    """Prazo do pedido em segundos. Retorna (timeout, None) ou (None, resposta de erro)"""
+    timeout = data.get('timeout', DEFAULT_JOB_TIMEOUT)
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not 0 < timeout <= MAX_JOB_TIMEOUT:
+        return None, (jsonify({'error': f'timeout deve estar entre 0 e {MAX_JOB_TIMEOUT} segundos'}), 400)
+    return timeout, None
+
+
+def parse_priority(data):
+    """Prioridade do pedido (maior é atendida antes). Retorna (prioridade, None) ou (None, resposta de erro)"""
+    priority = data.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, int) or not MIN_PRIORITY <= priority <= MAX_PRIORITY:
+        return None, (jsonify({'error': f'priority deve ser um inteiro entre {MIN_PRIORITY} e {MAX_PRIORITY}'}), 400)
+    return priority, None
+
+
+def request_client():
+    """Cliente do pedido para o fair share: cabeçalho X-Client-Id ou, sem ele, o endereço de origem"""
+    return request.headers.get('X-Client-Id') or request.remote_addr or 'anonimo'
+
+
+def parse_dtype(data):
+    """dtype pedido para o cálculo (None mantém o das entradas). Retorna (dtype, None) ou (None, resposta de erro)"""
+    dtype = data.get('dtype')
+    if dtype is not None and dtype not in DTYPES:
+        return None, (jsonify({'error': f"dtype inválido. Opções: {list(DTYPES)}"}), 400)
+    return dtype, None
+
+
+def parse_batch_request():
+    """Valida um pedido de lote: {"pairs": [{"matrixA": ..., "matrixB": ...}, ...], "timeout"?, "dtype"?, "priority"?}.
+    Retorna (pares validados, opções, None) ou (None, None, resposta de erro)"""
+    if not request.is_json:
+        return None, None, (jsonify({'error': 'Content-Type deve ser application/json'}), 400)
+
+    data = request.get_json()
+    pairs = data.get('pairs') if isinstance(data, dict) else None
+    if not isinstance(pairs, list) or not pairs:
+        return None, None, (jsonify({'error': 'JSON deve conter uma lista pairs não vazia'}), 400)
+
+    dtype, error = parse_dtype(data)
+    if error:
+        return None, None, error
+
+    validated = []
+    for index, pair in enumerate(pairs):
+        if not isinstance(pair, dict) or 'matrixA' not in pair or 'matrixB' not in pair:
+            return None, None, (jsonify({'error': f'pairs[{index}] deve conter matrixA e matrixB'}), 400)
+        try:
+            matrix_a, _ = resolve_operand(pair['matrixA'], f'pairs[{index}].matrixA')
+            matrix_b, _ = resolve_operand(pair['matrixB'], f'pairs[{index}].matrixB')
+            matrix_a, shape_a, _ = as_matrix(matrix_a, f'pairs[{index}].matrixA')
+            matrix_b, shape_b, _ = as_matrix(matrix_b, f'pairs[{index}].matrixB')
+        except ValueError as e:
+            return None, None, (jsonify({'error': f'Matrizes inválidas: {e}'}), 400)
+
+        if isinstance(matrix_a, CSRMatrix) or isinstance(matrix_b, CSRMatrix):
+            return None, None, (jsonify({'error': f'pairs[{index}]: lotes aceitam apenas matrizes densas'}), 400)
+        if shape_a[1] != shape_b[0]:
+            return None, None, (jsonify({'error': f'pairs[{index}]: dimensões incompatíveis para multiplicação'}), 400)
+        try:
+            matrix_a, matrix_b, _ = apply_dtype(matrix_a, matrix_b, dtype)
+        except (ValueError, OverflowError) as e:
+            return None, None, (jsonify({'error': f'pairs[{index}]: {e}'}), 400)
+        validated.append((matrix_a, matrix_b))
+
+    timeout, error = parse_timeout(data)
+    if error:
+        return None, None, error
+    priority, error = parse_priority(data)
+    if error:
+        return None, None, error
+    return validated, {'timeout': timeout, 'client': request_client(), 'priority': priority}, None
+
+
+def admission_error(work, options):
+    """Controle de admissão: 429 com Retry-After quando a fila à frente faria a tarefa passar do prazo.
+    Tarefas que sozinhas passariam do prazo entram (o prazo foi escolhido pelo cliente).
+    Retorna None se a tarefa pode entrar."""
+    wait, queued = task_manager.estimate_wait(work, options['client'], options['priority'])
+    if queued <= 0 or wait <= options['timeout'] or math.isinf(wait):
+        return None
+
+    retry_after = max(1, math.ceil(min(queued, wait - options['timeout'])))
+    metrics.inc('matrix_jobs_rejected_total', lane=job_lane(work))
+    print(f"Tarefa recusada (fila de {queued:.1f}s, prazo {options['timeout']}s); tentar em {retry_after}s")
+    return (jsonify({'error': 'Cluster sobrecarregado: a tarefa não terminaria no prazo',
+                     'retry_after': retry_after, 'estimated_wait': wait}), 429, {'Retry-After': str(retry_after)})
+
+
+def scratch_matrix(shape, dtype):
+    """Memmap temporário no armazenamento para um operando convertido de dtype. O arquivo é
+    removido logo após a criação: o mapeamento continua válido e o espaço volta ao descartá-lo"""
+    scratch_id = uuid.uuid4().hex
+    matrix = matrix_store.create(scratch_id, shape, dtype)
+    matrix_store.discard(scratch_id)
+    return matrix
+
+
+def start_job(options):
+    """Cria a tarefa distribuída e entrega as sub-tarefas.
+    Retorna (task_id, None) ou (None, resposta de erro)"""
+    # Precisão do cálculo: operandos convertidos (e inteiros verificados contra overflow) antes do
+    # cache e do recorte, para que chunks, transporte e kernels usem o dtype escolhido
+    try:
+        matrix_a, matrix_b, _ = apply_dtype(options['matrix_a'], options['matrix_b'], options.get('dtype'),
+                                            scratch_matrix)
+    except (ValueError, OverflowError) as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    # Ids do armazenamento são hashes do conteúdo original: não valem para operandos convertidos
+    if matrix_a is not options['matrix_a']:
+        options = dict(options, matrix_a=matrix_a, matrix_a_id=None)
+    if matrix_b is not options['matrix_b']:
+        options = dict(options, matrix_b=matrix_b, matrix_b_id=None)
+
+    # Produtos repetidos são respondidos pelo cache, sem passar pelos workers. O cache guarda
+    # resultados em memória (devolvidos inline): pedidos com outOfCore explícito não o consultam
+    cache_key = result_cache_key(options['matrix_a'], options['matrix_b'], options['engine'],
+                                 options['matrix_a_id'], options['matrix_b_id'])
+    cached = result_cache.get(cache_key) if not options['out_of_core'] else None
+    if cached is not None:
+        task_id = task_manager.create_cached_task(cached, options['engine'], options['decomposition'],
+                                                  options['scheduling'], options['sparse'])
+        return task_id, None
+
+    # Verificar se há workers disponíveis
+    if len(connected_workers) == 0:
+        return None, (jsonify({'error': 'Nenhum worker conectado'}), 503)
+
+    (rows, inner), cols = options['matrix_a'].shape, options['matrix_b'].shape[1]
+    error = admission_error(rows * inner * cols, options)
+    if error:
+        return None, error
+
+    # Criar tarefa distribuída com tratamento de erro
+    task_result = task_manager.create_task(options['matrix_a'], options['matrix_b'], options['engine'],
+                                           options['decomposition'], options['k_split'],
+                                           options['scheduling'], options['timeout'], cache_key,
+                                           options['matrix_b_id'], options['out_of_core'],
+                                           options['client'], options['priority'])
+
+    if task_result is None or task_result == (None, None):
+        return None, (jsonify({'error': 'Falha ao criar tarefa distribuída'}), 500)
+
+    task_id, subtasks = task_result
+    if task_id is None or subtasks is None:
+        return None, (jsonify({'error': 'Dados de tarefa inválidos'}), 500)
+
+    # Distribuir sub-tarefas: no modo estático, conforme o plano por capacidade; no dinâmico, acordar os workers livres
+    for subtask, worker_id in subtasks:
+        send_subtask(subtask, worker_id)
+
+    dispatch_available()
+    return task_id, None
+
+
+def result_payload(task):
+    """Resultado pronto para JSON e seu formato ('csr' ou 'dense').
+    Com operando esparso o formato é escolhido pela densidade; resultados out-of-core ficam no armazenamento"""
+    if task['result_ref'] is not None:
+        return None, 'dense'
+    result = task['result_matrix']
+    if task['sparse']:
+        result = choose_result_format(result)
+    return matrix_to_json(result), 'csr' if isinstance(result, CSRMatrix) else 'dense'
+
+
+def batch_results(task):
+    """Resultados de uma tarefa em lote na ordem original dos pares"""
+    results = [None] * task['total_rows']
+    for indices, group_result in zip(task['groups'], task['group_results']):
+        for position, index in enumerate(indices):
+            results[index] = group_result[position].tolist()
+    return results
+
+
+def result_ref_payload(task):
+    """Resultado out-of-core: id para baixar de /api/matrices/<id>?format=npy (ou None)"""
+    return task['result_ref'] and {
+        'id': task['result_ref'],
+        'shape': [task['total_rows'], task['total_cols']],
+        'dtype': str(task['result_matrix'].dtype)
+    }
+
+
+def job_result_response(task, timeline=False):
+    """Resposta HTTP de uma tarefa finalizada (ou ainda em andamento).
+    Com `timeline`, inclui a duração das fases de cada sub-tarefa"""
+    if task['status'] == 'completed' and task['kind'] == 'batch':
+        response = {
+            'success': True,
+            'job_id': task['task_id'],
+            'results': batch_results(task),
+            'batch_size': task['total_rows'],
+            'groups': len(task['groups']),
+            # Sem dtype pedido os grupos podem diferir: informa o mais amplo
+            'dtype': str(np.result_type(*(result.dtype for result in task['group_results']))),
+            'workers_used': len(task['workers_used']),
+            'execution_time': task['end_time'] - task['start_time'],
+            'subtasks_completed': task['completed_subtasks'],
+            'phases': phase_summary(task)
+        }
+        if timeline:
+            response['timeline'] = task['timeline']
+        return jsonify(response), 200
+
+    if task['status'] == 'completed':
+        result, result_format = result_payload(task)
+        response = {
+            'success': True,
+            'job_id': task['task_id'],
+            'result': result,
+            'result_format': result_format,
+            'result_ref': result_ref_payload(task),
+            'dtype': str(task['result_matrix'].dtype),
+            'workers_used': len(task['workers_used']),
+            'engine': task['engine'],
+            'decomposition': task['decomposition'],
+            'scheduling': task['scheduling'],
+            'execution_time': task['end_time'] - task['start_time'],
+            'subtasks_completed': task['completed_subtasks'],
+            'cached': task['cached'],
+            'phases': phase_summary(task)
+        }
+        if timeline:
+            response['timeline'] = task['timeline']
+        return jsonify(response), 200
+
+    if task['status'] == 'timeout':
+        return jsonify({'error': 'Timeout na execução distribuída', 'job_id': task['task_id']}), 408
+
+    if task['status'] == 'cancelled':
+        return jsonify({'error': 'Tarefa cancelada', 'job_id': task['task_id']}), 409
+
+    if task['status'] == 'failed':
+        return jsonify({'error': f"Falha na execução distribuída: {task['error']}", 'job_id': task['task_id']}), 500
+
+    return jsonify({'job_id': task['task_id'], 'status': task['status']}), 202
+
+
+def stream_job_response(task_id):
+    """Resposta NDJSON que envia cada bloco do resultado assim que ele é inserido"""
+    task = task_manager.get_task(task_id)
+    updates = task_manager.subscribe(task_id)
+
+    def generate():
+        try:
+            yield json.dumps({'type': 'job', 'job_id': task_id,
+                              'rows': task['total_rows'], 'cols': task['total_cols'],
+                              'out_of_core': task['result_ref'] is not None}) + '\n'
+            while True:
+                block = updates.get()
+                if block is None:
+                    break
+                start_row, end_row, start_col, end_col = block
+                line = {'type': 'block', 'start_row': start_row, 'end_row': end_row,
+                        'start_col': start_col, 'end_col': end_col}
+                # Out-of-core só informa a posição; os valores ficam no arquivo do resultado
+                if task['result_ref'] is None:
+                    line['rows'] = task['result_matrix'][start_row:end_row, start_col:end_col].tolist()
+                yield json.dumps(line) + '\n'
+
+            summary = {'type': 'done', 'job_id': task_id, 'status': task['status']}
+            if task['status'] == 'completed':
+                summary.update({
+                    'workers_used': len(task['workers_used']),
+                    'execution_time': task['end_time'] - task['start_time'],
+                    'subtasks_completed': task['completed_subtasks'],
+                    'result_ref': result_ref_payload(task)
+                })
+            yield json.dumps(summary) + '\n'
+        finally:
+            task_manager.unsubscribe(task_id, updates)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
 @app.route('/api/multiply-matrices', methods=['POST'])
 def multiply_matrices_distributed():
-    """Endpoint que distribui multiplicação para workers"""
+    """Endpoint que distribui multiplicação para workers e aguarda o resultado"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type deve ser application/json'}), 400
+        options, error = parse_job_request()
+        if error:
+            return error
 
-        data = request.get_json()
+        print("Aguardando conclusão das sub-tarefas...")
+        start_timer = time.time()
 
-        if not data or 'matrixA' not in data or 'matrixB' not in data:
-            return jsonify({'error': 'JSON deve conter matrixA e matrixB'}), 400
+        task_id, error = start_job(options)
+        if error:
+            return error
 
-        matrix_a = data['matrixA']
-        matrix_b = data['matrixB']
+        if options['stream']:
+            return stream_job_response(task_id)
 
-        # Validações básicas
-        if not validate_matrix(matrix_a) or not validate_matrix(matrix_b):
-            return jsonify({'error': 'Matrizes inválidas'}), 400
+        # Aguardar o sinal de conclusão (sem polling); o monitor encerra a tarefa no prazo
+        task = task_manager.get_task(task_id)
+        task['done'].wait(options['timeout'])
+        if task['status'] == 'pending':
+            task_manager.finish_task(task_id, 'timeout')
 
-        if len(matrix_a[0]) != len(matrix_b):
-            return jsonify({'error': 'Dimensões incompatíveis para multiplicação'}), 400
+        end_time = time.time()
+        print(f"Tempo total para receber as respostas: {end_time - start_timer:.4f} segundos")
 
-        # Verificar se há workers disponíveis
-        if len(connected_workers) == 0:
-            return jsonify({'error': 'Nenhum worker conectado'}), 503
+        return job_result_response(task, options['timeline'])
 
-        print("Aguardando conclusão das sub-tarefas...")
-        start_timer = time.time()
+    except Exception as e:
+        print(f"ERRO:{str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
 
-        # Criar tarefa distribuída com tratamento de erro
-        task_result = task_manager.create_task(matrix_a, matrix_b)
 
-        if task_result is None or task_result == (None, None):
-            return jsonify({'error': 'Falha ao criar tarefa distribuída'}), 500
+@app.route('/api/multiply-batch', methods=['POST'])
+def multiply_batch_distributed():
+    """Multiplica muitos pares pequenos: pares do mesmo shape são empilhados e cada worker
+    recebe faixas inteiras de pares, calculadas com um único matmul"""
+    try:
+        pairs, options, error = parse_batch_request()
+        if error:
+            return error
 
-        task_id, subtasks = task_result
-        if task_id is None or subtasks is None:
-            return jsonify({'error': 'Dados de tarefa inválidos'}), 500
+        if not any(info['capabilities'].get('batch', False) for info in connected_workers.values()):
+            return jsonify({'error': 'Nenhum worker conectado com suporte a lotes'}), 503
 
+        error = admission_error(batch_work(pairs), options)
+        if error:
+            return error
 
-        # Distribuir sub-tarefas para workers
-        worker_list = list(connected_workers.keys())
+        task_id = task_manager.create_batch_task(pairs, options['timeout'], options['client'], options['priority'])
+        dispatch_available()
 
-        for i, subtask in enumerate(subtasks):
-            worker_id = worker_list[i % len(worker_list)]
-            socketio.emit('execute_task', subtask, room=connected_workers[worker_id]['session_id'])
+        task = task_manager.get_task(task_id)
+        task['done'].wait(options['timeout'])
+        if task['status'] == 'pending':
+            task_manager.finish_task(task_id, 'timeout')
 
-        # Aguardar conclusão com logs
-        timeout = 30
-        start_time = time.time()
+        return job_result_response(task)
 
-        while task_id in pending_tasks and (time.time() - start_time) < timeout:
-            elapsed = time.time() - start_time
-            if int(elapsed) % 5 == 0:  # Log a cada 5 segundos
-                remaining_tasks = pending_tasks[task_id]['total_subtasks'] - pending_tasks[task_id][
-                    'completed_subtasks']
-            time.sleep(0.1)
+    except Exception as e:
+        print(f"ERRO:{str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
 
-        end_time = time.time()
-        print(f"Tempo total para receber as respostas: {end_time - start_timer:.4f} segundos")
 
-        # Verificar resultado
-        if task_id in completed_tasks:
-            result = completed_tasks[task_id]
-            return jsonify({
-                'success': True,
-                'result': result['result_matrix'],
-                'workers_used': len(connected_workers),
-                'execution_time': result['end_time'] - result['start_time'],
-                'subtasks_completed': result['completed_subtasks']
-            }), 200
-        else:
-            return jsonify({'error': 'Timeout na execução distribuída'}), 408
+@app.route('/api/multiply-chain', methods=['POST'])
+def multiply_chain_distributed():
+    """Produto em cadeia M0·M1·...·Mn: a ordem minimiza as multiplicações (programação dinâmica),
+    cada passo é uma tarefa distribuída e os intermediários ficam no servidor; só o produto final volta"""
+    try:
+        options, error = parse_chain_request()
+        if error:
+            return error
+
+        operands = options['operands']
+        dims = [matrix.shape[0] for matrix, _ in operands] + [operands[-1][0].shape[1]]
+        flops, split = chain_order(dims)
+        # Admissão pelo trabalho da cadeia inteira; cada passo ainda passa pela de start_job
+        error = admission_error(flops, options)
+        if error:
+            return error
+
+        start_timer = time.time()
+        deadline = start_timer + options['timeout']
+        steps = []
+        failure = []
+
+        def run_step(left, right):
+            (matrix_a, matrix_a_id), (matrix_b, matrix_b_id) = left, right
+            remaining = max(0, deadline - time.time())
+            task_id, error = start_job({
+                'matrix_a': matrix_a,
+                'matrix_b': matrix_b,
+                'matrix_a_id': matrix_a_id,
+                'matrix_b_id': matrix_b_id,
+                'engine': options['engine'],
+                'decomposition': 'rows',
+                'k_split': 1,
+                'scheduling': 'dynamic',
+                'timeout': remaining,
+                'out_of_core': None,
+                'dtype': options['dtype'],
+                'client': options['client'],
+                'priority': options['priority'],
+                'sparse': isinstance(matrix_a, CSRMatrix) or isinstance(matrix_b, CSRMatrix)
+            })
+            if error:
+                failure.append(error)
+                return None
+
+            task = task_manager.get_task(task_id)
+            steps.append(task)
+            task['done'].wait(remaining)
+            if task['status'] == 'pending':
+                task_manager.finish_task(task_id, 'timeout')
+            if task['status'] != 'completed':
+                failure.append(job_result_response(task))
+                return None
+
+            # Intermediário esparso continua esparso se a densidade permitir
+            result = task['result_matrix']
+            if task['sparse']:
+                result = choose_result_format(result)
+            return result, task['result_ref']
+
+        final = evaluate_chain(operands, split, run_step)
+
+        # Intermediários nunca são devolvidos ao cliente: liberar a memória (e os arquivos out-of-core)
+        task = steps[-1] if final is not None else None
+        for step in steps:
+            if step is not task:
+                task_manager.discard_task(step['task_id'])
+
+        if final is None:
+            return failure[0]
+
+        result, result_format = result_payload(task)
+        return jsonify({
+            'success': True,
+            'job_id': task['task_id'],
+            'result': result,
+            'result_format': result_format,
+            'result_ref': result_ref_payload(task),
+            'order': chain_parenthesization(split, 0, len(operands) - 1),
+            'dtype': str(task['result_matrix'].dtype),
+            'flops': flops,
+            'steps': len(steps),
+            'workers_used': len(set().union(*(step['workers_used'] for step in steps))),
+            'engine': options['engine'],
+            'execution_time': time.time() - start_timer,
+            'subtasks_completed': sum(step['completed_subtasks'] for step in steps)
+        }), 200
 
     except Exception as e:
         print(f"ERRO:{str(e)}")
@@ -217,20 +1752,132 @@ def multiply_matrices_distributed():
         return jsonify({'error': str(e)}), 500
 
 
-def validate_matrix(matrix):
-    """Valida se é uma matriz válida"""
-    if not isinstance(matrix, list) or len(matrix) == 0:
-        return False
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Cria uma tarefa assíncrona e retorna o id imediatamente"""
+    try:
+        options, error = parse_job_request()
+        if error:
+            return error
+
+        task_id, error = start_job(options)
+        if error:
+            return error
+
+        return jsonify({
+            'job_id': task_id,
+            'status': task_manager.get_task(task_id)['status'],
+            'timeout': options['timeout'],
+            'status_url': f'/api/jobs/{task_id}',
+            'result_url': f'/api/jobs/{task_id}/result'
+        }), 202
 
-    row_length = len(matrix[0])
-    for row in matrix:
-        if not isinstance(row, list) or len(row) != row_length:
-            return False
-        for element in row:
-            if not isinstance(element, (int, float)):
-                return False
+    except Exception as e:
+        print(f"ERRO:{str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progresso de uma tarefa"""
+    task = task_manager.get_task(job_id)
+    if task is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+
+    return jsonify({
+        'job_id': job_id,
+        'status': task['status'],
+        'completed_subtasks': task['completed_subtasks'],
+        'total_subtasks': task['total_subtasks'],
+        'rows_pending': task['total_rows'] - task['next_row'],
+        'elapsed': task.get('end_time', time.time()) - task['start_time'],
+        'timeout': task['timeout']
+    })
+
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Blocos do resultado em NDJSON, à medida que as sub-tarefas terminam"""
+    if task_manager.get_task(job_id) is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    return stream_job_response(job_id)
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Resultado de uma tarefa (202 enquanto estiver em andamento)"""
+    task = task_manager.get_task(job_id)
+    if task is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    return job_result_response(task, request.args.get('timeline') in ('1', 'true'))
 
-    return True
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancela uma tarefa em andamento"""
+    task = task_manager.get_task(job_id)
+    if task is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+
+    if not task_manager.finish_task(job_id, 'cancelled'):
+        return jsonify({'error': f"Tarefa já finalizada ({task['status']})", 'job_id': job_id}), 409
+
+    return jsonify({'job_id': job_id, 'status': 'cancelled'})
+
+
+@app.route('/api/matrices', methods=['POST'])
+def upload_matrix():
+    """Armazena uma matriz (JSON {"matrix": [[...]]} ou bytes de um .npy) e retorna seu id"""
+    try:
+        if request.is_json:
+            data = request.get_json()
+            if not isinstance(data, dict) or 'matrix' not in data:
+                return jsonify({'error': 'JSON deve conter matrix'}), 400
+            matrix, _, _ = as_matrix(data['matrix'], 'matrix')
+            # O armazenamento guarda só .npy densos; esparsas seguem inline nos pedidos
+            if isinstance(matrix, CSRMatrix):
+                return jsonify({'error': 'Matrizes esparsas não podem ser armazenadas'}), 400
+            matrix_id = matrix_store.put(matrix)
+        else:
+            # .npy gravado em disco em blocos, sem carregar o corpo inteiro na memória
+            matrix_id = matrix_store.put_stream(request.stream, lambda matrix: as_matrix(matrix, 'matrix')[0])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Erro ao armazenar matriz: {e}")
+        return jsonify({'error': f'Falha ao armazenar a matriz: {e}'}), 500
+
+    return jsonify(describe_stored_matrix(matrix_id)), 201
+
+
+@app.route('/api/matrices/<matrix_id>', methods=['GET'])
+def get_matrix(matrix_id):
+    """Metadados de uma matriz armazenada; com ?format=npy, o próprio arquivo"""
+    if matrix_id not in matrix_store:
+        return jsonify({'error': 'Matriz não encontrada'}), 404
+    if request.args.get('format') == 'npy':
+        return send_file(matrix_store.path(matrix_id), mimetype='application/octet-stream',
+                         as_attachment=True, download_name=f"{matrix_id}.npy")
+    return jsonify(describe_stored_matrix(matrix_id))
+
+
+@app.route('/api/matrices/<matrix_id>', methods=['DELETE'])
+def delete_matrix(matrix_id):
+    """Remove uma matriz do armazenamento"""
+    if matrix_id not in matrix_store or not matrix_store.delete(matrix_id):
+        return jsonify({'error': 'Matriz não encontrada'}), 404
+    return jsonify({'id': matrix_id, 'deleted': True})
+
+
+def describe_stored_matrix(matrix_id):
+    """Id, shape e dtype de uma matriz armazenada"""
+    matrix = matrix_store.get(matrix_id)
+    return {
+        'id': matrix_id,
+        'shape': list(matrix.shape),
+        'dtype': str(matrix.dtype),
+        'nbytes': matrix.nbytes
+    }
 
 
 # Eventos WebSocket para workers
@@ -238,42 +1885,69 @@ def validate_matrix(matrix):
 def handle_worker_connect(data):
     """Worker se conecta ao servidor"""
     worker_id = data.get('worker_id', str(uuid.uuid4()))
+
+    # Reconexão com o mesmo id: as sub-tarefas da sessão anterior voltam para a fila
+    if worker_id in connected_workers:
+        task_manager.requeue_worker_subtasks(worker_id)
     worker_info = {
         'worker_id': worker_id,
         'session_id': request.sid,
         'connected_at': time.time(),
         'tasks_completed': 0,
-        'status': 'available'
+        'status': 'available',
+        'capabilities': data.get('capabilities', {}),
+        'cached_matrices': set(),
+        'inflight': {},
+        'slots': 1,
+        'last_seen': time.time()
     }
+    worker_info['throughput'] = worker_info['capabilities'].get('cpu_cores', 1) * DEFAULT_CORE_THROUGHPUT
+    worker_info['throughput_samples'] = 0
+    worker_info['wire_format'] = negotiate_wire_format(worker_info['capabilities'])
+    # Codecs aceitos pelos dois lados; o worker usa a mesma lista para comprimir os resultados
+    worker_info['codecs'] = negotiate_codecs(worker_info['capabilities'])
+    # Workers com fila local recebem a próxima sub-tarefa enquanto calculam a atual
+    slots = worker_info['capabilities'].get('slots', 1)
+    worker_info['slots'] = min(MAX_WORKER_SLOTS, slots) if isinstance(slots, int) and slots > 0 else 1
 
     connected_workers[worker_id] = worker_info
-    emit('worker_registered', {'worker_id': worker_id, 'status': 'registered'})
+    emit('worker_registered', {'worker_id': worker_id, 'status': 'registered',
+                               'wire_format': worker_info['wire_format'], 'codecs': worker_info['codecs']})
+
+    print(f"Worker {worker_id} conectado (kernel: {worker_info['capabilities'].get('kernel', 'python')}, "
+          f"formato: {worker_info['wire_format']}, codecs: {worker_info['codecs']}). "
+          f"Total workers: {len(connected_workers)}")
+
+    start_lease_monitor()
 
-    print(f"Worker {worker_id} conectado. Total workers: {len(connected_workers)}")
+    # Workers que não pedem tarefas explicitamente recebem trabalho pendente ao se registrar
+    dispatch_to_worker(worker_id)
 
 
 @socketio.on('task_completed')
 def handle_task_completed(data):
     """Worker retorna resultado da sub-tarefa"""
+    received_at = time.time()
+    task_id = data.get('task_id')
+    subtask_id = data.get('subtask_id')
+    worker_id = data.get('worker_id')
 
     try:
-        task_id = data.get('task_id')
-        subtask_id = data.get('subtask_id')
-        result = data.get('result')
+        result = decode_matrix(data.get('result'))
         start_row = data.get('start_row')
-        worker_id = data.get('worker_id')
-
 
         # Validar dados recebidos
         if not all([task_id, subtask_id, result is not None, start_row is not None, worker_id]):
+            task_manager.fail_subtask(task_id, subtask_id, worker_id, 'resultado incompleto')
             return
 
-        if worker_id in connected_workers:
+        if task_manager.touch_worker(worker_id):
             connected_workers[worker_id]['tasks_completed'] += 1
-            connected_workers[worker_id]['status'] = 'available'
+            task_manager.record_throughput(worker_id, task_id, subtask_id, data.get('execution_time'))
 
         # Completar sub-tarefa
-        is_complete = task_manager.complete_subtask(task_id, subtask_id, result, start_row)
+        is_complete = task_manager.complete_subtask(task_id, subtask_id, result, start_row, worker_id,
+                                                    subtask_spans(data, received_at), received_at)
 
         if is_complete:
             print(f"SUCESSO - Tarefa {task_id} completada por {len(connected_workers)} workers")
@@ -282,6 +1956,67 @@ def handle_task_completed(data):
         print(f"ERRO: {e}")
         import traceback
         traceback.print_exc()
+        task_manager.fail_subtask(task_id, subtask_id, worker_id, e)
+
+    finally:
+        # O slot é liberado em qualquer saída (resultado aceito, recusado ou malformado) e o worker
+        # livre recebe a próxima sub-tarefa (vale também para workers antigos)
+        task_manager.release_worker(worker_id, subtask_id)
+        dispatch_to_worker(worker_id)
+
+
+@socketio.on('task_failed')
+def handle_task_failed(data):
+    """Worker não conseguiu executar a sub-tarefa: libera o slot e a devolve à fila"""
+    worker_id = data.get('worker_id')
+    task_manager.touch_worker(worker_id)
+    task_manager.fail_subtask(data.get('task_id'), data.get('subtask_id'), worker_id, data.get('error'))
+    dispatch_available()
+
+
+def forget_cached_matrices(worker_id, matrix_ids):
+    """Matrizes que o worker removeu do cache (LRU): voltam a ser enviadas inline"""
+    worker = connected_workers.get(worker_id)
+    if worker is not None and isinstance(matrix_ids, list):
+        worker['cached_matrices'].difference_update(matrix_ids)
+
+
+@socketio.on('request_task')
+def handle_request_task(data):
+    """Worker ocioso pede a próxima sub-tarefa (escalonamento por demanda)"""
+    worker_id = data.get('worker_id')
+    forget_cached_matrices(worker_id, data.get('evicted'))
+    if task_manager.touch_worker(worker_id):
+        dispatch_to_worker(worker_id)
+
+
+@socketio.on('worker_heartbeat')
+def handle_worker_heartbeat(data):
+    """Heartbeat periódico do worker: renova os leases das suas sub-tarefas"""
+    worker_id = data.get('worker_id')
+    forget_cached_matrices(worker_id, data.get('evicted'))
+    if task_manager.touch_worker(worker_id):
+        dispatch_to_worker(worker_id)
+
+
+@socketio.on('request_matrix')
+def handle_request_matrix(data):
+    """Worker pede novamente uma matriz que não está no seu cache (resposta via ack)"""
+    matrix_id = data.get('matrix_id')
+    worker_id = data.get('worker_id')
+    matrix = task_manager.get_shared_matrix(matrix_id)
+
+    if matrix is None or worker_id not in connected_workers:
+        print(f"ERRO - Matriz {matrix_id} solicitada por {worker_id} não encontrada")
+        return None
+
+    worker = connected_workers[worker_id]
+    worker['cached_matrices'].add(matrix_id)
+    # Como em build_payload: workers sem suporte a CSR recebem a matriz densificada
+    matrix = densify_unless(matrix, worker['capabilities'].get('sparse', False))
+    return {'matrix_id': matrix_id,
+            'matrix': encode_matrix(matrix, worker['wire_format'], worker['codecs'], payload_compression)}
+
 
 @socketio.on('disconnect')
 def handle_worker_disconnect():
@@ -293,7 +2028,10 @@ def handle_worker_disconnect():
             break
 
     if worker_to_remove:
-        del connected_workers[worker_to_remove]
+        requeued = task_manager.requeue_worker_subtasks(worker_to_remove, remove=True)
+        if requeued:
+            print(f"Worker {worker_to_remove} desconectado; {requeued} sub-tarefas reatribuídas")
+            dispatch_available()
 
 
 @app.route('/status')
@@ -304,14 +2042,50 @@ def status():
         'workers': {wid: {
             'tasks_completed': info['tasks_completed'],
             'status': info['status'],
+            'kernel': info['capabilities'].get('kernel', 'python'),
+            'wire_format': info['wire_format'],
+            'codecs': info['codecs'],
+            'throughput': info['throughput'],
             'connected_time': time.time() - info['connected_at']
         } for wid, info in connected_workers.items()},
         'pending_tasks': len(pending_tasks),
-        'completed_tasks': len(completed_tasks)
+        'completed_tasks': len(completed_tasks),
+        'completed_tasks_bytes': task_manager.completed_bytes,
+        'result_cache': result_cache.stats(),
+        'compression': payload_compression.stats(),
+        'queue': task_manager.queue_stats()
     })
 
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas no formato texto do Prometheus: fases das sub-tarefas por worker, tarefas e memória"""
+    metrics.set('matrix_workers_connected', len(connected_workers))
+    metrics.set('matrix_pending_tasks', len(pending_tasks))
+    metrics.set('matrix_completed_tasks_bytes', task_manager.completed_bytes)
+    backlog = task_manager.queue_stats()['backlog_seconds']
+    if backlog is not None:
+        metrics.set('matrix_backlog_seconds', backlog)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    port = 5000
-    print(f"Workers podem se conectar em ws://localhost:{port}")
-    socketio.run(app, debug=True, port=port, allow_unsafe_werkzeug=True)
+    parser = argparse.ArgumentParser(description='Servidor de multiplicação distribuída de matrizes')
+    parser.add_argument('--runtime', choices=RUNTIMES, default='threading',
+                        help='threading: servidor de desenvolvimento do Werkzeug; gevent/eventlet: green threads, '
+                             'para milhares de workers e clientes em um processo')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--debug', action='store_true', help='modo debug do Flask (recarrega ao editar o código)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='registra cada pacote Socket.IO/Engine.IO e cada requisição HTTP')
+    args = parser.parse_args()
+
+    if args.verbose:
+        for name in ('socketio.server', 'engineio.server'):
+            logging.getLogger(name).setLevel(logging.INFO)
+
+    print(f"Workers podem se conectar em ws://{args.host}:{args.port} (runtime: {RUNTIME})")
+    # O servidor do Werkzeug só é usado no runtime threading
+    options = {'allow_unsafe_werkzeug': True} if RUNTIME == 'threading' else {}
+    socketio.run(app, host=args.host, port=args.port, debug=args.debug, log_output=args.verbose, **options)
@@ -1,133 +1,252 @@
+import argparse
+import queue
 import socketio
 import sys
+import threading
 import time
-import concurrent.futures
 import uuid
 from multiprocessing import cpu_count
 
+from modules.matrix_multiply import ENGINES, NUMPY_ENGINES, resolve_engine, as_matrix, matrix_shape
+from modules.wire_format import WIRE_FORMATS, encode_matrix, decode_matrix
+from modules.compression import CODECS, CodecSelector
+from modules.matrix_cache import MatrixCache
+from modules.process_pool import SharedMemoryPool, POOL_MIN_WORK
+
+try:
+    import numpy as np
+except ImportError:  # Worker continua funcional com os engines em Python puro
+    np = None
+
+AVAILABLE_KERNELS = ['auto'] + list(ENGINES)
+
+# Limite do cache LRU de matrizes B recebidas do servidor
+MATRIX_CACHE_BYTES = 512 * 1024 * 1024
+
+# Sub-tarefas que o servidor pode enviar antes da atual terminar (a próxima chega enquanto esta calcula)
+PREFETCH_TASKS = 2
+
+# Intervalo entre heartbeats (bem abaixo do HEARTBEAT_TIMEOUT do servidor)
+HEARTBEAT_INTERVAL = 5
+
+
+def describe_shape(matrix):
+    """Descreve as dimensões de uma matriz (lista, array ou CSR) para os logs"""
+    if hasattr(matrix, 'shape'):
+        return ' x '.join(str(dim) for dim in matrix.shape)
+    if not matrix:
+        return '0 x 0'
+    return f"{len(matrix)} x {len(matrix[0]) if isinstance(matrix[0], list) else '?'}"
+
+
+def task_id_of(task_data):
+    """Servidores atuais enviam o task_id; para os antigos, extrair do subtask_id
+    (formato uuid_startrow_endrow, ex.: 59a9f3a6-919c-4ce8-8b8e-e9ec57c5e01e_0_2)"""
+    task_id = task_data.get('task_id')
+    if task_id:
+        return task_id
+    subtask_id = task_data['subtask_id']
+    subtask_parts = subtask_id.split('_')
+    if len(subtask_parts) >= 3:
+        # O UUID tem 5 partes separadas por hífen, juntar tudo exceto os últimos 2 elementos
+        return '_'.join(subtask_parts[:-2])
+    return subtask_id  # Fallback
+
 
 class MatrixWorker:
-    def __init__(self, server_url='http://localhost:5000', worker_id=None):
+    def __init__(self, server_url='http://localhost:5000', worker_id=None, kernel=None,
+                 matrix_cache_bytes=MATRIX_CACHE_BYTES, processes=None, prefetch=PREFETCH_TASKS,
+                 wire_formats=None, codecs=None):
         self.server_url = server_url
         self.worker_id = worker_id or f"worker_{uuid.uuid4().hex[:8]}"
+        self.kernel = kernel or 'auto'
+        if self.kernel not in AVAILABLE_KERNELS:
+            raise ValueError(f"Kernel '{self.kernel}' indisponível. Opções: {AVAILABLE_KERNELS}")
+        # Formatos anunciados ao servidor (restringir a ['json'] força o formato JSON)
+        self.wire_formats = wire_formats or WIRE_FORMATS
+        unsupported = set(self.wire_formats) - set(WIRE_FORMATS)
+        if unsupported:
+            raise ValueError(f"Formato(s) {sorted(unsupported)} indisponível(is). Opções: {WIRE_FORMATS}")
+        # Codecs anunciados ao servidor (lista vazia desativa a compressão)
+        self.codecs = list(CODECS) if codecs is None else codecs
+        unsupported = set(self.codecs) - set(CODECS)
+        if unsupported:
+            raise ValueError(f"Codec(s) {sorted(unsupported)} indisponível(is). Opções: {list(CODECS)}")
+        # Codecs aceitos pelo servidor para os resultados (informados no registro)
+        self.server_codecs = []
+        self.compression = CodecSelector()
         self.sio = socketio.Client()
         self.is_connected = False
+        # Desconexão pedida com disconnect(): não tentar reconectar
+        self.closing = False
+        # Sinaliza o fim do keep_alive (acorda a espera entre heartbeats)
+        self.stopped = threading.Event()
         self.tasks_processed = 0
+        # Ids que saíram do cache desde o último aviso: o servidor volta a enviar essas matrizes inline
+        self.evicted_matrices = []
+        self.evicted_lock = threading.Lock()
+        self.matrix_cache = MatrixCache(matrix_cache_bytes, on_evict=self.on_matrices_evicted)
+        # Emits com anexos binários ocupam vários pacotes e não podem se intercalar entre threads
+        self.emit_lock = threading.Lock()
+
+        # Os handlers só decodificam e enfileiram; uma única thread calcula, enquanto a próxima
+        # sub-tarefa já é recebida (rede e cálculo se sobrepõem)
+        self.prefetch = max(1, prefetch)
+        self.task_queue = queue.Queue()
+        self.compute_thread = threading.Thread(target=self.compute_loop, daemon=True)
+        self.compute_thread.start()
+
+        # Engines em Python puro usam um processo por núcleo (A e B em memória compartilhada)
+        processes = cpu_count() if processes is None else processes
+        self.pool = SharedMemoryPool(processes) if processes > 1 else None
 
         # Eventos SocketIO
         self.sio.on('connect', self.on_connect)
         self.sio.on('disconnect', self.on_disconnect)
         self.sio.on('worker_registered', self.on_registered)
         self.sio.on('execute_task', self.on_execute_task)
+        self.sio.on('lease_probe', self.on_lease_probe)
 
-    def validate_matrix_structure(self, matrix, matrix_name):
-        """Valida se a matriz tem estrutura retangular válida"""
-        if not matrix:
-            raise ValueError(f"{matrix_name} não pode estar vazia")
-
-        if not isinstance(matrix, list):
-            raise ValueError(f"{matrix_name} deve ser uma lista")
+    def multiply_matrices_chunk(self, matrix_a_chunk, matrix_b, engine=None, matrix_b_id=None):
+        """Multiplica um chunk da matriz A com matriz B completa usando o engine escolhido.
+        Aceita listas (JSON) ou arrays (formato binário); retorna array para engines NumPy.
+        B já chega validada por resolve_matrix_b (uma vez por matriz, não por chunk).
+        Engines em Python puro dividem o chunk entre os processos do pool."""
 
-        if len(matrix) == 0:
-            raise ValueError(f"{matrix_name} não pode ter zero linhas")
-
-        # Verificar primeira linha
-        if not isinstance(matrix[0], list):
-            raise ValueError(f"Primeira linha de {matrix_name} deve ser uma lista")
+        try:
+            print(f"  matrix_a_chunk: {describe_shape(matrix_a_chunk)}")
+            print(f"  matrix_b: {describe_shape(matrix_b)}")
 
-        if len(matrix[0]) == 0:
-            raise ValueError(f"Primeira linha de {matrix_name} não pode estar vazia")
+            a, _, _ = as_matrix(matrix_a_chunk, "matrix_a_chunk")
+            b = matrix_b
 
-        # Verificar se todas as linhas têm o mesmo tamanho
-        expected_cols = len(matrix[0])
-        for i, row in enumerate(matrix):
-            if not isinstance(row, list):
-                raise ValueError(f"Linha {i} de {matrix_name} deve ser uma lista")
+            if engine not in (None, 'auto') and engine not in ENGINES:
+                print(f"[{self.worker_id}] Engine '{engine}' indisponível, usando '{self.kernel}'")
+                engine = None
+            engine = resolve_engine(engine or self.kernel, a, b)
 
-            if len(row) != expected_cols:
-                raise ValueError(f"Linha {i} de {matrix_name} tem {len(row)} colunas, esperado {expected_cols}")
+            shape_a, shape_b = matrix_shape(a), matrix_shape(b)
+            if shape_a[1] != shape_b[0]:
+                raise ValueError(f"Dimensões incompatíveis: matrix_a_chunk cols ({shape_a[1]}) != matrix_b rows ({shape_b[0]})")
 
-            # Verificar se todos os elementos são números
-            for j, element in enumerate(row):
-                if not isinstance(element, (int, float)):
-                    raise ValueError(
-                        f"Elemento [{i}][{j}] de {matrix_name} deve ser um número, recebido {type(element)}")
+            if (self.pool is not None and engine not in NUMPY_ENGINES
+                    and shape_a[0] * shape_a[1] * shape_b[1] >= POOL_MIN_WORK):
+                result_matrix = self.pool.multiply(a, b, engine, matrix_b_id)
+                print(f"[{self.worker_id}] Multiplicação ({engine}, {self.pool.processes} processos) concluída com sucesso")
+                return result_matrix
 
-        return True
+            if engine not in NUMPY_ENGINES and np is not None:
+                # Engines em Python puro trabalham sobre listas
+                a = a.tolist()
+                b = b.tolist() if isinstance(b, np.ndarray) else b
 
-    def multiply_matrices_chunk(self, matrix_a_chunk, matrix_b):
-        """Multiplica um chunk da matriz A com matriz B completa usando paralelismo avançado"""
+            result_matrix = ENGINES[engine](a, b)
 
-        try:
-            print(
-                f"  matrix_a_chunk: {len(matrix_a_chunk) if matrix_a_chunk else 0} x {len(matrix_a_chunk[0]) if matrix_a_chunk and matrix_a_chunk[0] else 0}")
-            print(
-                f"  matrix_b: {len(matrix_b) if matrix_b else 0} x {len(matrix_b[0]) if matrix_b and matrix_b[0] else 0}")
-            self.validate_matrix_structure(matrix_a_chunk, "matrix_a_chunk")
-            self.validate_matrix_structure(matrix_b, "matrix_b")
-
-            rows_a = len(matrix_a_chunk)
-            cols_b = len(matrix_b[0])
-            cols_a = len(matrix_a_chunk[0])
-            rows_b = len(matrix_b)
-
-            if cols_a != rows_b:
-                raise ValueError(f"Dimensões incompatíveis: matrix_a_chunk cols ({cols_a}) != matrix_b rows ({rows_b})")
-
-            # Criar lista de todas as multiplicações a serem realizadas
-            tasks = [(i, j) for i in range(rows_a) for j in range(cols_b)]
-
-            def compute_element(task):
-                i, j = task
-                current_sum = 0
-                for k in range(cols_a):
-                    if k >= len(matrix_b):
-                        raise IndexError(f"Índice k={k} >= len(matrix_b)={len(matrix_b)}")
-                    if j >= len(matrix_b[k]):
-                        raise IndexError(f"Índice j={j} >= len(matrix_b[{k}])={len(matrix_b[k])}")
-                    if k >= len(matrix_a_chunk[i]):
-                        raise IndexError(f"Índice k={k} >= len(matrix_a_chunk[{i}])={len(matrix_a_chunk[i])}")
-                    current_sum += matrix_a_chunk[i][k] * matrix_b[k][j]
-                return (i, j, current_sum)
-
-            # Usando ThreadPoolExecutor para dividir igualmente entre as threads
-            result_matrix = [[0 for _ in range(cols_b)] for _ in range(rows_a)]
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                for i, j, value in executor.map(compute_element, tasks):
-                    result_matrix[i][j] = value
-
-            print(f"[{self.worker_id}] Multiplicação paralela concluída com sucesso")
+            print(f"[{self.worker_id}] Multiplicação ({engine}) concluída com sucesso")
             return result_matrix
 
-            print(f"[{self.worker_id}] Multiplicação paralela concluída com sucesso")
-            return result
-
         except Exception as e:
             print(f"[{self.worker_id}] Erro detalhado na multiplicação:")
             print(f"  Erro: {str(e)}")
             print(f"  Tipo: {type(e).__name__}")
 
             try:
-                print(
-                    f"  matrix_a_chunk structure: {[len(row) if isinstance(row, list) else 'not-list' for row in matrix_a_chunk] if matrix_a_chunk else 'None'}")
-                print(
-                    f"  matrix_b structure: {[len(row) if isinstance(row, list) else 'not-list' for row in matrix_b] if matrix_b else 'None'}")
+                if isinstance(matrix_a_chunk, list) and isinstance(matrix_b, list):
+                    print(
+                        f"  matrix_a_chunk structure: {[len(row) if isinstance(row, list) else 'not-list' for row in matrix_a_chunk]}")
+                    print(
+                        f"  matrix_b structure: {[len(row) if isinstance(row, list) else 'not-list' for row in matrix_b]}")
             except:
                 pass
 
             raise e
 
+    def multiply_batch_chunk(self, stacked_a, stacked_b):
+        """Multiplica uma faixa de pares do mesmo shape (arrays 3D) com um único matmul.
+        Sem NumPy, os pares são multiplicados um a um pelo kernel do worker."""
+        print(f"  lote: {describe_shape(stacked_a)} x {describe_shape(stacked_b)}")
+
+        if np is None:
+            return [ENGINES[resolve_engine(self.kernel, a, b)](a, b) for a, b in zip(stacked_a, stacked_b)]
+
+        stacked_a = np.asarray(stacked_a)
+        stacked_b = np.asarray(stacked_b)
+        if (stacked_a.ndim != 3 or stacked_b.ndim != 3 or len(stacked_a) != len(stacked_b)
+                or stacked_a.shape[2] != stacked_b.shape[1]):
+            raise ValueError(f"Lote inconsistente: {stacked_a.shape} x {stacked_b.shape}")
+
+        result = np.matmul(stacked_a, stacked_b)
+        print(f"[{self.worker_id}] Lote de {len(result)} pares concluído com sucesso")
+        return result
+
+    def resolve_matrix_b(self, task_data):
+        """Obtém a matriz B da tarefa: inline, do cache local ou pedindo novamente ao servidor"""
+        matrix_id = task_data.get('matrix_b_ref')
+
+        if 'matrix_b' in task_data:
+            matrix_b, _, _ = as_matrix(decode_matrix(task_data['matrix_b']), "matrix_b")
+            if matrix_id:
+                self.matrix_cache.put(matrix_id, matrix_b)
+            return matrix_b
+
+        if not matrix_id:
+            raise ValueError("Task data missing 'matrix_b'")
+
+        matrix_b = self.matrix_cache.get(matrix_id)
+        if matrix_b is not None:
+            return matrix_b
+
+        print(f"[{self.worker_id}] Matriz {matrix_id} fora do cache, solicitando ao servidor")
+        response = self.call('request_matrix', {'matrix_id': matrix_id, 'worker_id': self.worker_id})
+        if not response or 'matrix' not in response:
+            raise ValueError(f"Servidor não encontrou a matriz {matrix_id}")
+
+        matrix_b, _, _ = as_matrix(decode_matrix(response['matrix']), "matrix_b")
+        self.matrix_cache.put(matrix_id, matrix_b)
+        return matrix_b
+
+    def emit(self, event, data):
+        """Emit serializado entre as threads dos handlers"""
+        with self.emit_lock:
+            self.sio.emit(event, data)
+
+    def call(self, event, data, timeout=60):
+        """Emit com espera pelo ack do servidor, sem segurar o lock durante a espera"""
+        done = threading.Event()
+        response = []
+
+        def on_ack(*args):
+            response.extend(args)
+            done.set()
+
+        with self.emit_lock:
+            self.sio.emit(event, data, callback=on_ack)
+
+        if not done.wait(timeout):
+            raise TimeoutError(f"Sem resposta do servidor para '{event}'")
+        return response[0] if response else None
+
     def on_connect(self):
         """Callback de conexão"""
         print(f"[{self.worker_id}] Conectado ao servidor")
         self.is_connected = True
 
         # Registrar como worker
-        self.sio.emit('worker_connect', {
+        self.emit('worker_connect', {
             'worker_id': self.worker_id,
             'capabilities': {
                 'cpu_cores': cpu_count(),
-                'version': '1.1'
+                'kernel': self.kernel,
+                'kernels': AVAILABLE_KERNELS,
+                'wire_formats': self.wire_formats,
+                'codecs': self.codecs,
+                'matrix_cache': True,
+                'sparse': 'sparse' in ENGINES,
+                'batch': True,
+                'slots': self.prefetch,
+                'processes': self.pool.processes if self.pool else 1,
+                'pull': True,
+                'version': '1.2'
             }
         })
 
@@ -135,6 +254,8 @@ class MatrixWorker:
         """Callback de desconexão"""
         print(f"[{self.worker_id}] Desconectado do servidor")
         self.is_connected = False
+        if self.closing:
+            return
 
         tentativas = 0
         while tentativas < 3 and not self.is_connected:
@@ -152,61 +273,114 @@ class MatrixWorker:
     def on_registered(self, data):
         """Callback de registro confirmado"""
         print(f"[{self.worker_id}] Registrado no servidor: {data}")
+        # Servidores antigos não informam codecs: resultados seguem sem compressão
+        self.server_codecs = data.get('codecs', [])
+        self.request_task()
+
+    def on_lease_probe(self, data):
+        """Servidor perdeu os heartbeats e pergunta se o worker está vivo (a resposta vai no ack)"""
+        return {'worker_id': self.worker_id, 'tasks_processed': self.tasks_processed}
+
+    def on_matrices_evicted(self, matrix_ids):
+        with self.evicted_lock:
+            self.evicted_matrices.extend(matrix_ids)
+
+    def take_evicted(self):
+        """Ids removidos do cache ainda não informados ao servidor (esvazia a lista)"""
+        with self.evicted_lock:
+            evicted, self.evicted_matrices = self.evicted_matrices, []
+        return evicted
+
+    def request_task(self):
+        """Avisa o servidor que está livre e pede a próxima sub-tarefa (com as matrizes removidas do cache)"""
+        if self.is_connected:
+            self.emit('request_task', {'worker_id': self.worker_id, 'evicted': self.take_evicted()})
 
     def on_execute_task(self, task_data):
-        """Executa tarefa de multiplicação recebida"""
+        """Recebe uma sub-tarefa: decodifica os operandos e a enfileira para a thread de cálculo"""
+        received_at = time.time()
         print(f"[{self.worker_id}] Recebida tarefa: {task_data.get('subtask_id', 'unknown')}")
 
         try:
-            start_time = time.time()
-
             # Extrair dados da tarefa com validação
             if 'matrix_a_chunk' not in task_data:
                 raise ValueError("Task data missing 'matrix_a_chunk'")
-            if 'matrix_b' not in task_data:
-                raise ValueError("Task data missing 'matrix_b'")
             if 'start_row' not in task_data:
                 raise ValueError("Task data missing 'start_row'")
             if 'subtask_id' not in task_data:
                 raise ValueError("Task data missing 'subtask_id'")
 
-            matrix_a_chunk = task_data['matrix_a_chunk']
-            matrix_b = task_data['matrix_b']
-            start_row = task_data['start_row']
-            subtask_id = task_data['subtask_id']
-
-            # Executar multiplicação
-            result = self.multiply_matrices_chunk(matrix_a_chunk, matrix_b)
-
-            execution_time = time.time() - start_time
-            self.tasks_processed += 1
-
-            # CORREÇÃO: Extrair task_id corretamente
-            # Formato: uuid_startrow_endrow
-            # Exemplo: 59a9f3a6-919c-4ce8-8b8e-e9ec57c5e01e_0_2
-            subtask_parts = subtask_id.split('_')
-            if len(subtask_parts) >= 3:
-                # O UUID tem 5 partes separadas por hífen, juntar tudo exceto os últimos 2 elementos
-                task_id = '_'.join(subtask_parts[:-2])
+            matrix_a_chunk = decode_matrix(task_data['matrix_a_chunk'])
+            # Lotes trazem os dois operandos empilhados inline
+            if task_data.get('kind') == 'batch':
+                matrix_b = decode_matrix(task_data['matrix_b'])
             else:
-                task_id = subtask_id  # Fallback
-
-            # Enviar resultado de volta
-            response = {
-                'task_id': task_id,
-                'subtask_id': subtask_id,
-                'result': result,
-                'start_row': start_row,
-                'worker_id': self.worker_id,
-                'execution_time': execution_time,
-                'chunk_size': len(matrix_a_chunk)
-            }
+                matrix_b = self.resolve_matrix_b(task_data)
 
-            self.sio.emit('task_completed', response)
-            print(f"[{self.worker_id}] Tarefa {subtask_id} completada em {execution_time:.3f}s")
+            self.task_queue.put((task_data, matrix_a_chunk, matrix_b, received_at))
 
         except Exception as e:
             print(f"[{self.worker_id}] Erro ao executar tarefa: {e}")
+            self.report_failure(task_data, e)
+            self.request_task()
+
+    def report_failure(self, task_data, error):
+        """Avisa o servidor que a sub-tarefa falhou: ele libera o slot e a devolve à fila"""
+        if self.is_connected and 'subtask_id' in task_data:
+            self.emit('task_failed', {'task_id': task_id_of(task_data), 'subtask_id': task_data['subtask_id'],
+                                      'worker_id': self.worker_id, 'error': str(error)})
+
+    def compute_loop(self):
+        """Thread de cálculo: executa as sub-tarefas recebidas, uma por vez, na ordem de chegada"""
+        while True:
+            task_data, matrix_a_chunk, matrix_b, received_at = self.task_queue.get()
+            try:
+                self.execute_task(task_data, matrix_a_chunk, matrix_b, received_at)
+            except Exception as e:
+                print(f"[{self.worker_id}] Erro ao executar tarefa: {e}")
+                self.report_failure(task_data, e)
+            finally:
+                self.request_task()
+
+    def execute_task(self, task_data, matrix_a_chunk, matrix_b, received_at=None):
+        """Executa tarefa de multiplicação recebida e envia o resultado"""
+        # O tempo medido é só o de cálculo (a espera na fila não entra na vazão estimada pelo servidor)
+        start_time = time.time()
+        start_row = task_data['start_row']
+        subtask_id = task_data['subtask_id']
+        wire_format = task_data.get('wire_format', 'json')
+
+        # Executar multiplicação
+        if task_data.get('kind') == 'batch':
+            result = self.multiply_batch_chunk(matrix_a_chunk, matrix_b)
+        else:
+            result = self.multiply_matrices_chunk(matrix_a_chunk, matrix_b, task_data.get('engine'),
+                                                  task_data.get('matrix_b_ref'))
+
+        finished_at = time.time()
+        execution_time = finished_at - start_time
+        self.tasks_processed += 1
+
+        task_id = task_id_of(task_data)
+
+        # Enviar resultado de volta
+        response = {
+            'task_id': task_id,
+            'subtask_id': subtask_id,
+            'result': encode_matrix(result, wire_format, self.server_codecs, self.compression),
+            'start_row': start_row,
+            'start_col': task_data.get('start_col', 0),
+            'worker_id': self.worker_id,
+            'execution_time': execution_time,
+            'chunk_size': len(matrix_a_chunk)
+        }
+        # Devolver as marcas do servidor com as do worker para o cálculo das fases
+        if 'timings' in task_data:
+            response['timings'] = {**task_data['timings'], 'received_at': received_at or start_time,
+                                   'started_at': start_time, 'finished_at': finished_at}
+
+        self.emit('task_completed', response)
+        print(f"[{self.worker_id}] Tarefa {subtask_id} completada em {execution_time:.3f}s")
 
     def connect(self):
         """Conecta ao servidor"""
@@ -219,21 +393,27 @@ class MatrixWorker:
             return False
 
     def disconnect(self):
-        """Desconecta do servidor"""
+        """Desconecta do servidor e encerra o pool de processos"""
+        self.closing = True
+        self.stopped.set()
         if self.is_connected:
             self.sio.disconnect()
+        if self.pool is not None:
+            self.pool.shutdown()
 
     def keep_alive(self):
         """Mantém worker ativo"""
         try:
             while self.is_connected:
-                time.sleep(5)
+                if self.stopped.wait(HEARTBEAT_INTERVAL):
+                    break
                 if self.is_connected:
                     # Enviar heartbeat
-                    self.sio.emit('worker_heartbeat', {
+                    self.emit('worker_heartbeat', {
                         'worker_id': self.worker_id,
                         'tasks_processed': self.tasks_processed,
-                        'status': 'active'
+                        'status': 'active',
+                        'evicted': self.take_evicted()
                     })
         except KeyboardInterrupt:
             self.disconnect()
@@ -241,11 +421,26 @@ class MatrixWorker:
 
 def main():
     # Configurações do worker
-    server_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:5000'
-    worker_id = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(description='Worker de multiplicação distribuída de matrizes')
+    parser.add_argument('server_url', nargs='?', default='http://localhost:5000')
+    parser.add_argument('worker_id', nargs='?')
+    parser.add_argument('--kernel', default='auto', choices=AVAILABLE_KERNELS,
+                        help='engine usado quando a sub-tarefa não pede um específico')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS,
+                        help='restringe o formato de transmissão anunciado ao servidor (padrão: todos)')
+    parser.add_argument('--codecs', type=lambda value: [codec for codec in value.split(',') if codec],
+                        help=f"codecs de compressão anunciados, separados por vírgula; vazio desativa "
+                             f"(disponíveis: {','.join(CODECS)})")
+    parser.add_argument('--processes', type=int, default=cpu_count(),
+                        help='processos para os engines em Python puro (1 desativa o pool)')
+    parser.add_argument('--prefetch', type=int, default=PREFETCH_TASKS,
+                        help='sub-tarefas recebidas antecipadamente enquanto a atual calcula')
+    args = parser.parse_args()
 
     # Criar e iniciar worker
-    worker = MatrixWorker(server_url, worker_id)
+    worker = MatrixWorker(args.server_url, args.worker_id, kernel=args.kernel, processes=args.processes,
+                          prefetch=args.prefetch, wire_formats=[args.wire_format] if args.wire_format else None,
+                          codecs=args.codecs)
 
     if worker.connect():
         print(f"Worker {worker.worker_id}")